@@ -60,6 +60,19 @@ SECTORES_CONCEPCION = [
 # Lista final de ubicaciones a buscar.
 ACTIVE_LOCATIONS = ["Concepción"] + SECTORES_CONCEPCION + COMUNAS_CERCANAS
 
+# Jerarquía de búsqueda para el planificador adaptativo: cada ubicación amplia
+# con las sub-ubicaciones en que se divide solo si su búsqueda se satura
+# (Google Maps deja de mostrar resultados y podría estar ocultando empresas).
+LOCATION_TREE = {"Concepción": SECTORES_CONCEPCION}
+LOCATION_TREE.update({comuna: [] for comuna in COMUNAS_CERCANAS})
+
+# Área del Gran Concepción (Concepción, Talcahuano, Hualpén, San Pedro de la
+# Paz y Chiguayante) para la búsqueda por mosaico del mapa (--tiles): se busca
+# cada categoría en el área completa y se divide en cuadrantes cada zona cuya
+# búsqueda se satura, sin depender de la lista de sectores.
+# Formato: (latitud sur, longitud oeste, latitud norte, longitud este).
+SEARCH_BBOX = (-36.95, -73.20, -36.68, -72.95)
+
 
 # --- 2. Rutas y Nombres de Archivos ---
 import os
@@ -117,3 +130,52 @@ ACTIVE_CATEGORIES = [
     "Canal de televisión",
     "Diario"
 ]
+
+# --- 4. Lista Negra de Dominios ---
+# Sitios que nunca son la web propia de una empresa (redes sociales, buscadores,
+# librerías). La comparación es exacta por sufijo de dominio: 'facebook.com'
+# descarta facebook.com y m.facebook.com, pero no notfacebook.com.
+
+DOMAIN_BLACKLIST = [
+    'facebook.com',
+    'instagram.com',
+    'twitter.com',
+    'linkedin.com',
+    'youtube.com',
+    'tiktok.com',
+    'google.com',
+    'whatsapp.com',
+    'telegram.org',
+    'w3.org',
+    'sentry.io',
+    'jsdelivr.net'
+]
+
+# --- 5. Perfil de Navegador ---
+# Perfil liviano compartido por el scraper de Google Maps y el de correos: sin
+# ventana y sin descargar lo que no aporta datos. Se bloquean los recursos de
+# los tipos indicados y las URL que contienen alguno de los patrones.
+
+BROWSER_HEADLESS = True
+
+BLOCKED_RESOURCE_TYPES = ['image', 'media', 'font']
+
+BLOCKED_URL_PATTERNS = [
+    # Teselas, fotos y Street View de Google Maps
+    '/maps/vt',
+    '/kh/v=',
+    'streetviewpixels',
+    '/maps/preview/photo',
+    # Analítica, publicidad y rastreadores de terceros
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googlesyndication.com',
+    'connect.facebook.net',
+    'hotjar.com',
+    'clarity.ms',
+]
+
+# El contexto del navegador (pestañas, caché, memoria del renderizador) se
+# renueva tras esta cantidad de consultas de Maps o páginas renderizadas.
+BROWSER_RECYCLE_EVERY = 50
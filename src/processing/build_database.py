@@ -1,5 +1,9 @@
 import os
 import sys
+import io
+import json
+import hashlib
+import argparse
 import pandas as pd
 import sqlite3
 import logging
@@ -12,10 +16,17 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(PROJECT_ROOT)
 
-from src.config import DB_PATH, ACTIVE_LOCATIONS
+from src.config import DB_PATH, ACTIVE_LOCATIONS, DOMAIN_BLACKLIST
+from src.processing.location_matcher import get_location_matcher
+from src.processing.url_canonicalizer import (
+    ESTADO_DUPLICADA, ESTADO_PENDIENTE, ESTADO_URL_INVALIDA, canonicalize_url, initial_status
+)
 
 # Rutas de archivos
-INPUT_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'google_maps', 'google_maps_results.csv')
+RAW_DIR = os.path.join(PROJECT_ROOT, 'data', 'raw', 'google_maps')
+INPUT_JSONL_PATH = os.path.join(RAW_DIR, 'google_maps_results.jsonl')  # Salida actual del scraper (esquema fijo)
+INPUT_PARQUET_DIR = os.path.join(RAW_DIR, 'parquet')  # Salida opcional, una partición por ejecución
+INPUT_CSV_PATH = os.path.join(RAW_DIR, 'google_maps_results.csv')  # Formato antiguo, solo lectura
 
 # --- Funciones de Base de Datos ---
 def create_db_schema(cursor):
@@ -27,9 +38,14 @@ def create_db_schema(cursor):
         nombre TEXT NOT NULL UNIQUE,
         direccion TEXT,
         categoria_google TEXT, 
-        fuente TEXT NOT NULL
+        fuente TEXT NOT NULL,
+        ubicacion TEXT
     );
     """)
+    # Bases de datos creadas antes de registrar la comuna/sector de cada empresa
+    cursor.execute("PRAGMA table_info(empresas)")
+    if 'ubicacion' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE empresas ADD COLUMN ubicacion TEXT")
     # Tabla de teléfonos (relacionada con empresas)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS telefonos (
@@ -47,9 +63,19 @@ def create_db_schema(cursor):
         url TEXT NOT NULL,
         estado_scraping TEXT DEFAULT 'pendiente' NOT NULL,
         fecha_ultimo_scraping TIMESTAMP,
+        url_canonica TEXT,
+        dominio TEXT,
         FOREIGN KEY (empresa_id) REFERENCES empresas(id)
     );
     """)
+    # Bases de datos creadas antes de canonicalizar las webs al ingresarlas
+    cursor.execute("PRAGMA table_info(webs)")
+    web_columns = [column[1] for column in cursor.fetchall()]
+    for column in ['url_canonica', 'dominio']:
+        if column not in web_columns:
+            cursor.execute(f"ALTER TABLE webs ADD COLUMN {column} TEXT")
+    for index_name, columns in WEB_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON webs ({columns})")
     # Tabla de correos (relacionada con empresas)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS emails (
@@ -60,14 +86,45 @@ def create_db_schema(cursor):
         FOREIGN KEY (empresa_id) REFERENCES empresas(id)
     );
     """)
+    create_unique_indexes(cursor)
+    create_watermark_table(cursor)
     logging.info("Esquema de la base de datos verificado/creado exitosamente.")
 
+# Índices de consulta de la tabla webs: cola de pendientes, agrupación por
+# dominio y deduplicación por URL canónica.
+WEB_INDEXES = {
+    'idx_webs_estado': 'estado_scraping',
+    'idx_webs_dominio': 'dominio',
+    'idx_webs_empresa_canonica': 'empresa_id, url_canonica',
+}
+
+# Índices únicos que respaldan los INSERT ... ON CONFLICT de la carga masiva.
+UNIQUE_INDEXES = {
+    'idx_telefonos_empresa_numero': ('telefonos', 'empresa_id, numero'),
+    'idx_webs_empresa_url': ('webs', 'empresa_id, url'),
+    'idx_emails_empresa_email': ('emails', 'empresa_id, email'),
+}
+
+def create_unique_indexes(cursor):
+    """
+    Crea los índices únicos de las tablas relacionadas. Si una base de datos
+    antigua ya contiene duplicados, se conserva la fila más antigua de cada uno.
+    """
+    for index_name, (table, columns) in UNIQUE_INDEXES.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+        if cursor.fetchone():
+            continue
+        cursor.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {columns})")
+        if cursor.rowcount:
+            logging.warning(f"Se eliminaron {cursor.rowcount} filas duplicadas de '{table}' antes de crear {index_name}.")
+        cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table} ({columns})")
+
 # --- Funciones de Limpieza ---
 def is_valid_location(address, valid_locations):
     """
     Valida si una dirección pertenece a la región del Biobío y a una de las
     ubicaciones activas definidas en la configuración.
-    La validación no es sensible a mayúsculas/minúsculas.
+    La validación no es sensible a mayúsculas/minúsculas ni a tildes.
 
     Args:
         address (str): La dirección a validar.
@@ -76,19 +133,12 @@ def is_valid_location(address, valid_locations):
     Returns:
         bool: True si la ubicación es válida, False en caso contrario.
     """
-    if not isinstance(address, str):
-        return False
+    return get_location_matcher(tuple(valid_locations)).match(address) is not None
 
-    address_lower = address.lower()
-    
-    # Condición 1: Debe contener alguna variación de "Biobío"
-    # Se añade "bío bío" con espacio para corregir el bug de detección.
-    in_region = any(term in address_lower for term in ['biobío', 'bío-bío', 'bio-bio', 'bío bío'])
-    
-    # Condición 2: Debe contener una de las ubicaciones activas
-    in_location = any(loc.lower() in address_lower for loc in valid_locations)
-    
-    return in_region and in_location
+def clean_phone_numbers(phones):
+    """Versión vectorizada de `clean_phone_number`: deja solo dígitos y descarta los de menos de 8."""
+    cleaned = phones.astype('string').str.replace(r'\D', '', regex=True)
+    return cleaned.where((cleaned.str.len() >= 8).fillna(False))
 
 def clean_phone_number(phone):
     """Limpia y estandariza los números de teléfono."""
@@ -100,91 +150,351 @@ def clean_phone_number(phone):
         return cleaned
     return None
 
-# --- Lógica Principal ---
-def main():
-    """Lee los datos de Google Maps, los limpia y los inserta en la base de datos SQLite."""
-    if not os.path.exists(INPUT_CSV_PATH):
-        logging.error(f"El archivo de entrada no se encontró en: {INPUT_CSV_PATH}")
-        return
+# --- Lectura Incremental de Datos Crudos ---
+# Los archivos crudos solo crecen por el final. Para cada uno se guarda una marca
+# de agua (identidad del archivo, bytes y filas consumidas, y una huella del
+# prefijo consumido) y en la siguiente ejecución solo se lee lo agregado después.
+# La huella cubre todo el prefijo, para detectar también cambios en el medio del
+# archivo que conservan su tamaño; leerlo por bloques es mucho más barato que
+# volver a interpretarlo.
+FINGERPRINT_BLOCK = 1024 * 1024
 
-    # Asegurarse de que el directorio de la base de datos exista
-    db_dir = os.path.dirname(DB_PATH)
-    os.makedirs(db_dir, exist_ok=True)
+def create_watermark_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ingestion_watermarks (
+        source TEXT PRIMARY KEY,
+        device INTEGER NOT NULL,
+        inode INTEGER NOT NULL,
+        byte_offset INTEGER NOT NULL,
+        row_count INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+    );
+    """)
 
-    logging.info(f"Conectando a la base de datos en: {DB_PATH}")
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def get_watermark(cursor, source):
+    cursor.execute("""
+        SELECT device, inode, byte_offset, row_count, fingerprint
+        FROM ingestion_watermarks WHERE source = ?
+    """, (source,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return dict(zip(['device', 'inode', 'byte_offset', 'row_count', 'fingerprint'], row))
 
-    # Asegurarse de que el esquema de la DB exista
-    create_db_schema(cursor)
+def save_watermark(cursor, watermark):
+    cursor.execute("""
+        INSERT OR REPLACE INTO ingestion_watermarks
+            (source, device, inode, byte_offset, row_count, fingerprint, fecha_actualizacion)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, (watermark['source'], watermark['device'], watermark['inode'], watermark['byte_offset'],
+          watermark['row_count'], watermark['fingerprint']))
+
+def prefix_digest(f, length):
+    """SHA-256 (aún abierto, para seguir agregando datos) de los primeros `length` bytes del archivo."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    remaining = length
+    while remaining > 0:
+        block = f.read(min(remaining, FINGERPRINT_BLOCK))
+        if not block:
+            break
+        digest.update(block)
+        remaining -= len(block)
+    return digest
+
+def read_appended_lines(cursor, path, full=False):
+    """
+    Lee las líneas completas agregadas a `path` desde la última ingesta. Si el
+    archivo fue rotado, truncado o modificado (o `full` es True) se lee completo.
+
+    Returns:
+        tuple: (bytes nuevos, offset de inicio, marca de agua a guardar tras la carga)
+    """
+    source = os.path.relpath(path, PROJECT_ROOT)
+    stat = os.stat(path)
+    watermark = None if full else get_watermark(cursor, source)
+    with open(path, 'rb') as f:
+        start, rows_before, digest = 0, 0, hashlib.sha256()
+        if watermark:
+            same_file = (watermark['device'], watermark['inode']) == (stat.st_dev, stat.st_ino)
+            consumed = same_file and stat.st_size >= watermark['byte_offset'] and prefix_digest(f, watermark['byte_offset'])
+            if consumed and consumed.hexdigest() == watermark['fingerprint']:
+                start, rows_before, digest = watermark['byte_offset'], watermark['row_count'], consumed
+            else:
+                logging.warning(f"{source} fue rotado, truncado o modificado. Se reprocesa completo.")
+        f.seek(start)
+        data = f.read()
+        # Solo se consumen líneas completas; una última línea a medio escribir queda para la próxima vez
+        data = data[:data.rfind(b'\n') + 1]
+        end = start + len(data)
+        # La huella del nuevo prefijo continúa la del ya consumido, sin releerlo
+        digest.update(data)
+        new_watermark = {
+            'source': source, 'device': stat.st_dev, 'inode': stat.st_ino, 'byte_offset': end,
+            'row_count': rows_before + data.count(b'\n'), 'fingerprint': digest.hexdigest(),
+        }
+    return data, start, new_watermark
+
+def parse_jsonl(data, source):
+    """
+    Interpreta bloques JSON lines del scraper. Las líneas inválidas se omiten
+    con una advertencia.
+    """
+    records = []
+    for line_number, line in enumerate(data.splitlines(), 1):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            logging.warning(f"Línea inválida en {source} (línea {line_number} del bloque nuevo). Se omite.")
+    return pd.DataFrame(records)
+
+def parse_csv_tail(path, data, start):
+    """Interpreta el final agregado de un CSV, reutilizando la cabecera del archivo."""
+    if start > 0:
+        with open(path, 'rb') as f:
+            header = f.readline()
+        data = header + data
+    if not data.strip():
+        return pd.DataFrame()
+    # El CSV antiguo se escribía con columnas variables entre bloques; on_bad_lines='warn'
+    # evita que el parser falle con las líneas de formato incorrecto.
+    return pd.read_csv(io.BytesIO(data), on_bad_lines='warn')
+
+def load_raw_results(cursor, full=False):
+    """
+    Carga los resultados crudos de Google Maps agregados desde la última ingesta:
+    el final nuevo del JSON lines actual y del CSV del formato antiguo, y las
+    particiones Parquet aún no ingeridas.
+
+    Args:
+        cursor: Cursor de la base de datos donde se guardan las marcas de agua.
+        full (bool): Ignorar las marcas de agua y reprocesar todos los archivos.
+
+    Returns:
+        tuple: (DataFrame con los resultados nuevos o None si no hay archivos,
+                lista de marcas de agua a guardar junto con la carga)
+    """
+    frames = []
+    watermarks = []
+    for path, parse in [(INPUT_JSONL_PATH, 'jsonl'), (INPUT_CSV_PATH, 'csv')]:
+        if not os.path.exists(path):
+            continue
+        data, start, watermark = read_appended_lines(cursor, path, full)
+        logging.info(f"Leyendo {len(data)} bytes nuevos desde: {path} (offset {start})")
+        if parse == 'jsonl':
+            frames.append(parse_jsonl(data, path))
+        else:
+            frames.append(parse_csv_tail(path, data, start))
+        watermarks.append(watermark)
 
-    logging.info(f"Leyendo datos desde: {INPUT_CSV_PATH}")
-    # Usar on_bad_lines='warn' para que el parser ignore las líneas con formato incorrecto
-    # en lugar de fallar. Esto es crucial para manejar los CSV imperfectos del scraping.
-    df = pd.read_csv(INPUT_CSV_PATH, on_bad_lines='warn')
+    # Las particiones Parquet son inmutables: se ingiere cada archivo una sola vez
+    if os.path.isdir(INPUT_PARQUET_DIR):
+        for root, _, files in os.walk(INPUT_PARQUET_DIR):
+            for name in sorted(files):
+                if not name.endswith('.parquet'):
+                    continue
+                path = os.path.join(root, name)
+                source = os.path.relpath(path, PROJECT_ROOT)
+                if not full and get_watermark(cursor, source):
+                    continue
+                logging.info(f"Leyendo datos desde: {path}")
+                part = pd.read_parquet(path)
+                frames.append(part)
+                stat = os.stat(path)
+                watermarks.append({
+                    'source': source, 'device': stat.st_dev, 'inode': stat.st_ino, 'byte_offset': stat.st_size,
+                    'row_count': len(part), 'fingerprint': '',
+                })
 
-    # Renombrar columnas para consistencia
-    df.rename(columns={
+    if not watermarks:
+        return None, []
+    frames = [frame for frame in frames if not frame.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return df, watermarks
+
+# --- Carga Masiva ---
+def prepare_results(df):
+    """
+    Limpia y normaliza en bloque los resultados crudos: renombra columnas,
+    descarta filas sin nombre, limpia teléfonos, canonicaliza las webs
+    (columnas `url_canonica`, `dominio` y `estado_web`), y marca en la columna
+    `ubicacion` la comuna o sector reconocido en la dirección (NA si la fila
+    no pasa la validación geográfica).
+    """
+    df = df.rename(columns={
         'name': 'nombre',
         'address': 'direccion',
         'website': 'web',
         'phone_number': 'telefono',
         'place_type': 'categoria_google'
-    }, inplace=True)
+    })
+    for column in ['nombre', 'direccion', 'web', 'telefono', 'categoria_google']:
+        if column not in df.columns:
+            df[column] = None
 
-    empresas_agregadas = 0
-    telefonos_agregados = 0
-    webs_agregadas = 0
-    empresas_descartadas = 0
+    # Descartar nombres ausentes o vacíos (NaN, None y cadenas en blanco)
+    nombres = df['nombre'].astype('string')
+    df = df[(nombres.str.strip() != '').fillna(False)].copy()
 
-    for _, row in df.iterrows():
-        nombre_empresa = row.get('nombre')
-        direccion = row.get('direccion')
+    df['telefono'] = clean_phone_numbers(df['telefono'])
+    webs = df['web'].astype('string').str.strip()
+    df['web'] = webs.where((webs != '').fillna(False))
+    df = df.join(canonicalize_webs(df['web']))
+    df['ubicacion'] = get_location_matcher(tuple(ACTIVE_LOCATIONS)).match_series(df['direccion'])
+    return df
 
-        # Robust check for missing or empty names (handles NaN, None, and empty strings)
-        if pd.isna(nombre_empresa) or not str(nombre_empresa).strip():
-            continue
+def canonicalize_webs(webs):
+    """
+    Canonicaliza una columna de webs (cada valor distinto una sola vez) y
+    devuelve un DataFrame con `url_canonica`, `dominio` y `estado_web`, el
+    estado de scraping inicial: pendiente, omitido_blacklist o url_invalida.
+    """
+    rows = {}
+    for web in webs.dropna().unique():
+        canonical = canonicalize_url(web)
+        rows[web] = (
+            canonical.url if canonical else None,
+            canonical.dominio if canonical else None,
+            initial_status(canonical, DOMAIN_BLACKLIST),
+        )
+    columns = ['url_canonica', 'dominio', 'estado_web']
+    result = pd.DataFrame([rows.get(web, (None, None, None)) for web in webs], columns=columns, index=webs.index)
+    return result
 
-        # Validar geográficamente antes de procesar
-        if not is_valid_location(direccion, ACTIVE_LOCATIONS):
-            logging.debug(f"Empresa '{nombre_empresa}' descartada por ubicación no válida: {direccion}")
-            empresas_descartadas += 1
-            continue
+def canonicalize_stored_webs(cursor):
+    """
+    Canonicaliza las webs ya guardadas que aún no tienen URL canónica (bases
+    de datos anteriores a esta etapa). Las pendientes que resultan inválidas o
+    en lista negra reciben su estado, y las que repiten la URL canónica de
+    otra web de la misma empresa quedan como duplicadas.
 
-        # 1. Verificar si la empresa ya existe (por nombre)
-        cursor.execute("SELECT id FROM empresas WHERE nombre = ?", (nombre_empresa,))
-        result = cursor.fetchone()
+    Returns:
+        int: Cantidad de webs canonicalizadas.
+    """
+    cursor.execute("""
+        SELECT id, url, estado_scraping FROM webs
+        WHERE url_canonica IS NULL AND estado_scraping != ?
+    """, (ESTADO_URL_INVALIDA,))
+    updates = []
+    for web_id, url, estado in cursor.fetchall():
+        canonical = canonicalize_url(url)
+        if estado == ESTADO_PENDIENTE:
+            estado = initial_status(canonical, DOMAIN_BLACKLIST)
+        updates.append((
+            canonical.url if canonical else None, canonical.dominio if canonical else None, estado, web_id
+        ))
+    cursor.executemany(
+        "UPDATE webs SET url_canonica = ?, dominio = ?, estado_scraping = ? WHERE id = ?", updates
+    )
+    cursor.execute("""
+        UPDATE webs SET estado_scraping = ?
+        WHERE estado_scraping = ? AND url_canonica IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM webs WHERE url_canonica IS NOT NULL GROUP BY empresa_id, url_canonica
+        )
+    """, (ESTADO_DUPLICADA, ESTADO_PENDIENTE))
+    if cursor.rowcount:
+        logging.info(f"{cursor.rowcount} webs pendientes marcadas como duplicadas.")
+    return len(updates)
 
-        if result:
-            empresa_id = result[0]
-            logging.debug(f"La empresa '{nombre_empresa}' ya existe con ID: {empresa_id}")
-        else:
-            # 2. Si no existe, insertarla
-            cursor.execute("""
-                INSERT INTO empresas (nombre, direccion, categoria_google, fuente)
-                VALUES (?, ?, ?, ?)
-            """, (nombre_empresa, row.get('direccion'), row.get('categoria_google'), 'google_maps'))
-            empresa_id = cursor.lastrowid
-            empresas_agregadas += 1
-            logging.info(f"Nueva empresa agregada: '{nombre_empresa}' con ID: {empresa_id}")
-
-        # 3. Procesar y agregar teléfono
-        phone = clean_phone_number(row.get('telefono'))
-        if phone:
-            cursor.execute("SELECT id FROM telefonos WHERE numero = ? AND empresa_id = ?", (phone, empresa_id))
-            if not cursor.fetchone():
-                cursor.execute("INSERT INTO telefonos (empresa_id, numero) VALUES (?, ?)", (empresa_id, phone))
-                telefonos_agregados += 1
-
-        # 4. Procesar y agregar web
-        web = row.get('web')
-        if isinstance(web, str) and web:
-            cursor.execute("SELECT id FROM webs WHERE url = ? AND empresa_id = ?", (web, empresa_id))
-            if not cursor.fetchone():
-                cursor.execute("INSERT INTO webs (empresa_id, url) VALUES (?, ?)", (empresa_id, web))
-                webs_agregadas += 1
-
-    conn.commit()
+def to_sql_rows(frame):
+    """Convierte un DataFrame en tuplas para executemany, con None en lugar de NaN."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+def load_results(cursor, df):
+    """
+    Inserta empresas, teléfonos y webs con executemany + INSERT ... ON CONFLICT,
+    apoyándose en los índices únicos. Debe ejecutarse dentro de una transacción.
+
+    Returns:
+        tuple: (empresas_agregadas, telefonos_agregados, webs_agregadas)
+    """
+    conn = cursor.connection
+
+    # 1. Empresas: la primera aparición de cada nombre define sus datos
+    empresas = df.drop_duplicates('nombre')[['nombre', 'direccion', 'categoria_google', 'ubicacion']]
+    changes = conn.total_changes
+    cursor.executemany("""
+        INSERT INTO empresas (nombre, direccion, categoria_google, ubicacion, fuente)
+        VALUES (?, ?, ?, ?, 'google_maps')
+        ON CONFLICT(nombre) DO NOTHING
+    """, to_sql_rows(empresas))
+    empresas_agregadas = conn.total_changes - changes
+    # Completar la ubicación de empresas ingresadas antes de que se registrara
+    cursor.executemany(
+        "UPDATE empresas SET ubicacion = ? WHERE nombre = ? AND ubicacion IS NULL",
+        to_sql_rows(empresas[['ubicacion', 'nombre']])
+    )
+
+    # 2. Resolver los IDs de todas las empresas en una sola consulta
+    cursor.execute("SELECT nombre, id FROM empresas")
+    empresa_ids = dict(cursor.fetchall())
+    df = df.assign(empresa_id=df['nombre'].map(empresa_ids))
+
+    # 3. Teléfonos
+    telefonos = df[['empresa_id', 'telefono']].dropna().drop_duplicates()
+    changes = conn.total_changes
+    cursor.executemany("""
+        INSERT INTO telefonos (empresa_id, numero) VALUES (?, ?)
+        ON CONFLICT(empresa_id, numero) DO NOTHING
+    """, [(int(empresa_id), numero) for empresa_id, numero in to_sql_rows(telefonos)])
+    telefonos_agregados = conn.total_changes - changes
+
+    # 4. Webs, ya canonicalizadas: una por empresa y URL canónica, con su estado inicial
+    webs = df[['empresa_id', 'web', 'url_canonica', 'dominio', 'estado_web']].dropna(subset=['web'])
+    webs = webs.assign(clave=webs['url_canonica'].fillna(webs['web']))
+    webs = webs.drop_duplicates(['empresa_id', 'clave'])
+    rows = to_sql_rows(webs[['empresa_id', 'web', 'url_canonica', 'dominio', 'estado_web']])
+    changes = conn.total_changes
+    cursor.executemany("""
+        INSERT INTO webs (empresa_id, url, url_canonica, dominio, estado_scraping)
+        SELECT ?1, ?2, ?3, ?4, ?5
+        WHERE NOT EXISTS (SELECT 1 FROM webs WHERE empresa_id = ?1 AND url_canonica = ?3)
+        ON CONFLICT(empresa_id, url) DO NOTHING
+    """, [(int(empresa_id), url, canonica, dominio, estado) for empresa_id, url, canonica, dominio, estado in rows])
+    webs_agregadas = conn.total_changes - changes
+
+    return empresas_agregadas, telefonos_agregados, webs_agregadas
+
+# --- Lógica Principal ---
+def main(full=False):
+    """
+    Lee los datos de Google Maps agregados desde la última ejecución, los limpia
+    y los inserta en la base de datos SQLite. Con `full` se reprocesa todo.
+    """
+    # Asegurarse de que el directorio de la base de datos exista
+    db_dir = os.path.dirname(DB_PATH)
+    os.makedirs(db_dir, exist_ok=True)
+
+    logging.info(f"Conectando a la base de datos en: {DB_PATH}")
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Asegurarse de que el esquema de la DB exista
+    create_db_schema(cursor)
+
+    df, watermarks = load_raw_results(cursor, full=full)
+    if df is None:
+        logging.error(f"No se encontraron resultados de Google Maps en: {RAW_DIR}")
+        conn.close()
+        return
+
+    empresas_agregadas = telefonos_agregados = webs_agregadas = empresas_descartadas = 0
+    if not df.empty:
+        df = prepare_results(df)
+        ubicacion_valida = df['ubicacion'].notna()
+        empresas_descartadas = int((~ubicacion_valida).sum())
+        df = df[ubicacion_valida]
+
+    with conn:  # Una sola transacción para la carga y las marcas de agua
+        webs_canonicalizadas = canonicalize_stored_webs(cursor)
+        if webs_canonicalizadas:
+            logging.info(f"Se canonicalizaron {webs_canonicalizadas} webs existentes.")
+        if not df.empty:
+            empresas_agregadas, telefonos_agregados, webs_agregadas = load_results(cursor, df)
+        for watermark in watermarks:
+            save_watermark(cursor, watermark)
     conn.close()
 
     logging.info("--- Proceso de integración finalizado ---")
@@ -194,4 +504,8 @@ def main():
     logging.info(f"Nuevas webs agregadas: {webs_agregadas}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Integra los resultados de Google Maps en la base de datos.")
+    parser.add_argument('--completo', action='store_true',
+                        help='Ignorar las marcas de agua y reprocesar todos los archivos crudos.')
+    args = parser.parse_args()
+    main(full=args.completo)
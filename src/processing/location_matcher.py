@@ -0,0 +1,79 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Variantes de "Biobío" una vez normalizadas: biobio, bio-bio, bio bio
+REGION_PATTERN = r'\bbio[\s-]?bio\b'
+# Marcas diacríticas combinables (tildes, diéresis, virgulilla). La cadena no es
+# raw a propósito: la clase lleva los caracteres mismos y no escapes \u, que el
+# motor RE2 de las columnas de texto de pyarrow no acepta.
+COMBINING_MARKS_PATTERN = '[\u0300-\u036f]'
+
+
+def normalize_text(text):
+    """Pasa a minúsculas y elimina tildes (y la virgulilla de la ñ)."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def normalize_series(texts):
+    """Versión vectorizada de `normalize_text` para una columna de pandas."""
+    return (texts.astype('string')
+            .str.normalize('NFKD')
+            .str.replace(COMBINING_MARKS_PATTERN, '', regex=True)
+            .str.lower())
+
+
+class LocationMatcher:
+    """
+    Matcher compilado una sola vez a partir de una lista de ubicaciones
+    (comunas y sectores). Es insensible a mayúsculas y tildes, y además de
+    validar una dirección devuelve qué ubicación coincidió.
+
+    Todas las ubicaciones se combinan en una única expresión regular con
+    alternancia, ordenada de la más larga a la más corta. La búsqueda devuelve
+    la coincidencia más a la izquierda de la dirección, que en el formato de
+    Google Maps ("calle, sector, comuna, región") es la más específica; ante
+    dos ubicaciones en la misma posición gana la más larga (por ejemplo,
+    "Pedro de Valdivia Bajo" frente a "Pedro de Valdivia").
+    """
+
+    def __init__(self, locations):
+        self.canonical = {}
+        for location in locations:
+            self.canonical.setdefault(normalize_text(location), location)
+        alternatives = sorted(self.canonical, key=len, reverse=True)
+        self.location_pattern = r'\b(' + '|'.join(re.escape(alt) for alt in alternatives) + r')\b'
+        self.location_regex = re.compile(self.location_pattern)
+        self.region_regex = re.compile(REGION_PATTERN)
+
+    def match(self, address):
+        """
+        Devuelve la ubicación (con su escritura original) de una dirección de la
+        región del Biobío, o None si no pertenece a la región o a ninguna ubicación.
+        """
+        if not isinstance(address, str):
+            return None
+        normalized = normalize_text(address)
+        if not self.region_regex.search(normalized):
+            return None
+        found = self.location_regex.search(normalized)
+        return self.canonical[found.group(1)] if found else None
+
+    def match_series(self, addresses):
+        """
+        Versión vectorizada de `match` para una columna completa de direcciones.
+
+        Returns:
+            pd.Series: La ubicación coincidente de cada dirección, o NA.
+        """
+        normalized = normalize_series(addresses)
+        in_region = normalized.str.contains(REGION_PATTERN, regex=True).fillna(False).astype(bool)
+        matched = normalized.str.extract(self.location_pattern, expand=False).map(self.canonical)
+        return matched.where(in_region)
+
+
+@lru_cache(maxsize=8)
+def get_location_matcher(locations):
+    """Devuelve (y cachea) el matcher compilado para una tupla de ubicaciones."""
+    return LocationMatcher(locations)
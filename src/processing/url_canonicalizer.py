@@ -0,0 +1,100 @@
+import ipaddress
+import re
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit
+
+# Estados de scraping que se asignan al ingresar una web
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_OMITIDO_BLACKLIST = 'omitido_blacklist'  # El dominio está en la lista negra
+ESTADO_URL_INVALIDA = 'url_invalida'  # El texto no es una URL http(s) válida
+ESTADO_DUPLICADA = 'duplicada'  # La empresa ya tiene otra web con la misma URL canónica
+
+# URL canónica de una web y su dominio registrable (sin 'www.' ni subdominios).
+CanonicalUrl = namedtuple('CanonicalUrl', ['url', 'host', 'dominio'])
+
+# Sufijos bajo los cuales el dominio registrable tiene un nivel más. Incluye
+# los sufijos de dos niveles habituales en la región y las plataformas de
+# alojamiento donde cada subdominio es un sitio distinto (como en la Public
+# Suffix List): 'negocio.business.site' no debe agruparse con 'otro.business.site'.
+MULTI_LEVEL_SUFFIXES = frozenset((
+    'gob.cl', 'mil.cl', 'co.cl',
+    'com.ar', 'gob.ar', 'org.ar', 'com.br', 'gov.br', 'com.mx', 'gob.mx', 'com.pe', 'gob.pe',
+    'com.co', 'com.uy', 'com.bo', 'com.ec', 'com.py', 'com.ve', 'com.es', 'co.uk', 'com.au',
+    'blogspot.com', 'wordpress.com', 'wixsite.com', 'business.site', 'negocio.site',
+    'godaddysites.com', 'webnode.cl', 'webnode.com', 'jimdosite.com', 'jimdo.com',
+    'weebly.com', 'squarespace.com', 'site123.me', 'github.io', 'netlify.app', 'vercel.app',
+))
+
+HOST_REGEX = re.compile(r'^[a-z0-9]([a-z0-9-]*[a-z0-9])?(\.[a-z0-9]([a-z0-9-]*[a-z0-9])?)+$')
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def registrable_domain(host):
+    """Dominio registrable de un host: 'www.tienda.empresa.cl' -> 'empresa.cl'."""
+    if _is_ip(host):
+        return host
+    labels = host.split('.')
+    size = 3 if '.'.join(labels[-2:]) in MULTI_LEVEL_SUFFIXES else 2
+    return '.'.join(labels[-size:])
+
+
+def canonicalize_url(raw_url):
+    """
+    Normaliza la web de una empresa tal como viene de Google Maps
+    ('Sportlife.cl ', 'http://www.x.cl/inicio#top'...): agrega https:// si no
+    tiene esquema, pasa el host a minúsculas, quita el punto final, el puerto
+    por defecto y el fragmento.
+
+    Returns:
+        CanonicalUrl, o None si el texto no es una URL http(s) válida.
+    """
+    if not isinstance(raw_url, str):
+        return None
+    url = raw_url.strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = 'https://' + url.lstrip('/')
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    if parts.scheme.lower() not in ('http', 'https') or not parts.hostname:
+        return None
+
+    host = parts.hostname.rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+    if not (HOST_REGEX.match(host) or _is_ip(host)):
+        return None
+
+    scheme = parts.scheme.lower()
+    netloc = host
+    if port and port != {'http': 80, 'https': 443}[scheme]:
+        netloc = f'{host}:{port}'
+    canonical = urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+    return CanonicalUrl(canonical, host, registrable_domain(host))
+
+
+def is_blacklisted(host, blacklist):
+    """Comparación exacta por sufijo: 'm.facebook.com' está en la lista negra por 'facebook.com'."""
+    return any(host == domain or host.endswith('.' + domain) for domain in blacklist)
+
+
+def initial_status(canonical, blacklist):
+    """Estado de scraping inicial de una web ya canonicalizada (None si no es válida)."""
+    if canonical is None:
+        return ESTADO_URL_INVALIDA
+    if is_blacklisted(canonical.host, blacklist):
+        return ESTADO_OMITIDO_BLACKLIST
+    return ESTADO_PENDIENTE
@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+from src.config import BLOCKED_RESOURCE_TYPES, BLOCKED_URL_PATTERNS, BROWSER_HEADLESS, BROWSER_RECYCLE_EVERY
+
+# Lean browser settings shared by the Maps and the email scrapers.
+# `recycle_every` is the number of queries (Maps) or rendered pages (email)
+# after which the browser context is replaced; 0 disables recycling.
+BrowserProfile = namedtuple(
+    'BrowserProfile', ['headless', 'blocked_resource_types', 'blocked_url_patterns', 'recycle_every']
+)
+
+DEFAULT_PROFILE = BrowserProfile(
+    headless=BROWSER_HEADLESS,
+    blocked_resource_types=frozenset(BLOCKED_RESOURCE_TYPES),
+    blocked_url_patterns=tuple(BLOCKED_URL_PATTERNS),
+    recycle_every=BROWSER_RECYCLE_EVERY,
+)
+
+
+def should_block(profile, resource_type, url):
+    """True if a request of this Playwright resource type and URL must be aborted."""
+    return resource_type in profile.blocked_resource_types or any(
+        pattern in url for pattern in profile.blocked_url_patterns
+    )
+
+
+def vendor_worker_args(profile):
+    """
+    Command-line arguments that apply `profile` to the vendor `main.py`,
+    which runs in its own virtualenv and cannot import this module.
+    """
+    args = []
+    if profile.headless:
+        args.append('--headless')
+    if profile.blocked_resource_types:
+        args += ['--block-resource-types', ','.join(sorted(profile.blocked_resource_types))]
+    for pattern in profile.blocked_url_patterns:
+        args += ['--block-url', pattern]
+    if profile.recycle_every:
+        args += ['--recycle-every', str(profile.recycle_every)]
+    return args
+
+
+async def block_requests(target, profile):
+    """
+    Routes every request of a Playwright page or context (async API) through
+    `should_block`, aborting images, media, fonts, map tiles and trackers
+    before they are downloaded.
+    """
+    async def handle(route):
+        request = route.request
+        if should_block(profile, request.resource_type, request.url):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await target.route('**/*', handle)
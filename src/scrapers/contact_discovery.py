@@ -0,0 +1,111 @@
+import asyncio
+import html
+import logging
+import re
+from urllib.parse import urljoin, urlparse
+
+from src.scrapers.email_extractor import ContactLink, keyword_score, same_site
+
+# Rutas de contacto habituales que se prueban directamente en cada sitio
+CONTACT_PATHS = ('/contacto', '/contactanos', '/contact')
+MAX_SITEMAPS = 3  # Sitemaps leídos por sitio (el índice cuenta como uno)
+MAX_SITEMAP_BYTES = 2 * 1024 * 1024  # Los sitemaps enormes se leen solo hasta aquí
+
+SITEMAP_LINE_REGEX = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+LOC_REGEX = re.compile(r'<(?:\w+:)?loc>\s*(.*?)\s*</(?:\w+:)?loc>', re.IGNORECASE | re.DOTALL)
+SITEMAP_INDEX_REGEX = re.compile(r'<(?:\w+:)?sitemapindex\b', re.IGNORECASE)
+
+
+def sitemaps_from_robots(text, base_url):
+    """URLs de sitemaps declaradas en un robots.txt (directivas `Sitemap:`)."""
+    return [urljoin(base_url, url) for url in SITEMAP_LINE_REGEX.findall(text or '')]
+
+
+def parse_sitemap(text):
+    """
+    Lee las URL de un sitemap XML sin construir el árbol completo.
+
+    Returns:
+        tuple: (URLs de páginas, URLs de sitemaps hijos si es un índice).
+    """
+    urls = [html.unescape(url) for url in LOC_REGEX.findall(text or '')]
+    if SITEMAP_INDEX_REGEX.search(text or ''):
+        return [], urls
+    return urls, []
+
+
+def contact_links_from_urls(urls, site_host):
+    """ContactLink de las URL del mismo sitio cuya ruta parece de contacto."""
+    links = {}
+    for url in urls:
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not same_site(parsed.netloc.lower(), site_host):
+            continue
+        score = keyword_score(parsed.path)
+        if score:
+            links[url] = max(score, links.get(url, 0))
+    return [ContactLink(url, score) for url, score in links.items()]
+
+
+def _sitemap_priority(url):
+    # En índices como los de WordPress, page-sitemap.xml tiene las páginas institucionales
+    path = urlparse(url).path.lower()
+    return (-keyword_score(path), 'page' not in path, len(url))
+
+
+async def _from_sitemaps(fetcher, base_url, site_host, max_sitemaps):
+    robots = await fetcher.fetch_text(urljoin(base_url, '/robots.txt'))
+    pending = sitemaps_from_robots(robots, base_url) or [urljoin(base_url, '/sitemap.xml')]
+    pending = [url for url in pending if not url.lower().endswith('.gz')]
+    seen, urls = set(), []
+    while pending and len(seen) < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        pages, children = parse_sitemap(await fetcher.fetch_text(sitemap_url, MAX_SITEMAP_BYTES))
+        urls.extend(pages)
+        pending = sorted(pending + [url for url in children if not url.lower().endswith('.gz')],
+                         key=_sitemap_priority)
+    return contact_links_from_urls(urls, site_host)
+
+
+async def _from_probes(fetcher, base_url, site_host, paths):
+    async def probe(path):
+        final_url = await fetcher.probe(urljoin(base_url, path))
+        if not final_url:
+            return None
+        parsed = urlparse(final_url)
+        # Muchos sitios redirigen las rutas inexistentes a la portada
+        if not same_site(parsed.netloc.lower(), site_host) or parsed.path in ('', '/'):
+            return None
+        return final_url
+
+    found = await asyncio.gather(*(probe(path) for path in paths))
+    return contact_links_from_urls([url for url in found if url], site_host)
+
+
+async def discover_contact_pages(fetcher, base_url, paths=CONTACT_PATHS, max_sitemaps=MAX_SITEMAPS):
+    """
+    Busca páginas de contacto sin descargar la página principal: lee
+    robots.txt y los sitemaps del sitio y prueba con peticiones HEAD las
+    rutas de contacto habituales. `fetcher` debe ofrecer `fetch_text(url,
+    max_bytes)` y `probe(url)`.
+
+    Returns:
+        list: ContactLink ordenados de mayor a menor puntaje.
+    """
+    site_host = urlparse(base_url).netloc.lower()
+    results = await asyncio.gather(
+        _from_sitemaps(fetcher, base_url, site_host, max_sitemaps),
+        _from_probes(fetcher, base_url, site_host, paths),
+        return_exceptions=True,
+    )
+    links = {}
+    for result in results:
+        if isinstance(result, Exception):
+            logging.debug(f"Descubrimiento de contacto incompleto para {base_url}: {result!r}")
+            continue
+        for link in result:
+            links[link.url] = max(link.score, links.get(link.url, 0))
+    return [ContactLink(url, score) for url, score in sorted(links.items(), key=lambda item: (-item[1], len(item[0])))]
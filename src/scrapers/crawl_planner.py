@@ -0,0 +1,68 @@
+import heapq
+from urllib.parse import urlparse
+
+
+def page_priority(link):
+    """
+    Clave de orden de una página candidata: primero el mayor puntaje de
+    contacto (contacto > nosotros > empresa), luego las rutas menos
+    profundas y, a igualdad, las URL más cortas.
+    """
+    path = urlparse(link.url).path
+    depth = len([segment for segment in path.split('/') if segment])
+    return (-link.score, depth, len(link.url))
+
+
+class CrawlPlanner:
+    """
+    Decide qué páginas de un sitio rastrear y cuándo parar. Las páginas
+    candidatas (ContactLink del extractor) se ordenan por `page_priority`;
+    cada página descargada puede aportar nuevos enlaces, que entran a la
+    misma cola. El plan termina al alcanzar `email_target` correos, al
+    agotar el presupuesto de `page_budget` páginas (incluida la principal) o
+    al quedarse sin candidatas.
+    """
+
+    def __init__(self, page_budget, email_target=1):
+        self.page_budget = page_budget
+        self.email_target = email_target
+        self.emails = set()
+        self.pages_planned = 0
+        self._frontier = []
+        self._seen = set()
+
+    @property
+    def satisfied(self):
+        """Indica si ya se obtuvieron los correos buscados."""
+        return bool(self.email_target) and len(self.emails) >= self.email_target
+
+    @property
+    def budget_left(self):
+        return max(0, self.page_budget - self.pages_planned)
+
+    def has_pending(self):
+        return bool(self._frontier) and self.budget_left > 0 and not self.satisfied
+
+    def mark_visited(self, url):
+        """Registra una URL ya descargada (p. ej. la principal o su redirección)."""
+        self._seen.add(url)
+
+    def start(self, url):
+        """Registra la descarga de la página principal, que también consume presupuesto."""
+        self.mark_visited(url)
+        self.pages_planned += 1
+
+    def add_page(self, extraction):
+        """Incorpora los correos y los enlaces de contacto de una página descargada."""
+        self.emails.update(extraction.emails)
+        for link in extraction.contact_links:
+            if link.url not in self._seen:
+                self._seen.add(link.url)
+                heapq.heappush(self._frontier, (page_priority(link), link.url))
+
+    def next_url(self):
+        """Siguiente página a descargar, o None si el plan terminó."""
+        if not self.has_pending():
+            return None
+        self.pages_planned += 1
+        return heapq.heappop(self._frontier)[1]
@@ -0,0 +1,131 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+# Operaciones aceptadas por el escritor
+OP_EMAILS = 'emails'
+OP_ESTADO = 'estado'
+
+_FIN = object()  # Marca de cierre de la cola
+
+# Índice único del que depende INSERT OR IGNORE para no duplicar correos; el
+# mismo que crea build_database (UNIQUE_INDEXES), para las bases que no se
+# han reconstruido desde entonces.
+EMAILS_UNIQUE_INDEX = ('idx_emails_empresa_email', 'emails', 'empresa_id, email')
+
+
+class DbWriter:
+    """
+    Escritor único de la base de datos para el scraper de correos.
+
+    Los crawlers encolan correos y cambios de estado sin bloquear el bucle de
+    eventos; un hilo dedicado, con una sola conexión en modo WAL, los agrupa y
+    los confirma en una única transacción cada `batch_size` operaciones o cada
+    `flush_interval` segundos, lo que ocurra primero. Así muchos sitios se
+    guardan con un solo fsync y nunca hay dos conexiones escribiendo a la vez.
+    Al iniciar se asegura el índice único de `emails` (EMAILS_UNIQUE_INDEX).
+    """
+
+    def __init__(self, db_path, batch_size=200, flush_interval=2.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches_committed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def save_emails(self, empresa_id, emails):
+        """Encola los correos encontrados para una empresa."""
+        if emails:
+            self._queue.put((OP_EMAILS, empresa_id, sorted(emails)))
+
+    def update_status(self, empresa_id, url, status):
+        """Encola el nuevo estado de scraping de una web."""
+        self._queue.put((OP_ESTADO, empresa_id, url, status))
+
+    def close(self):
+        """Confirma lo pendiente y detiene el hilo escritor."""
+        if self._thread.is_alive():
+            self._queue.put(_FIN)
+            self._thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._ensure_unique_index(conn)
+            stop = False
+            while not stop:
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        op = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if op is _FIN:
+                        stop = True
+                        break
+                    batch.append(op)
+                if batch:
+                    self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _ensure_unique_index(conn):
+        """
+        Crea el índice único de `emails` si falta, conservando la fila más
+        antigua de cada correo duplicado. Sin él, INSERT OR IGNORE insertaría
+        de nuevo los correos ya guardados en cada rastreo.
+        """
+        index_name, table, columns = EMAILS_UNIQUE_INDEX
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)).fetchone():
+            return
+        try:
+            with conn:
+                deleted = conn.execute(
+                    f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {columns})"
+                ).rowcount
+                conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+            if deleted:
+                logging.warning(f"Se eliminaron {deleted} correos duplicados antes de crear {index_name}.")
+        except sqlite3.Error as e:
+            logging.error(f"No se pudo crear el índice único {index_name}: {e}")
+
+    def _commit(self, conn, batch):
+        email_rows = []
+        status_rows = []
+        for op in batch:
+            if op[0] == OP_EMAILS:
+                _, empresa_id, emails = op
+                email_rows.extend((empresa_id, email) for email in emails)
+            else:
+                _, empresa_id, url, status = op
+                status_rows.append((status, empresa_id, url))
+
+        try:
+            with conn:
+                cursor = conn.cursor()
+                # Se omite fecha_creacion porque la tabla la añade por defecto
+                cursor.executemany("INSERT OR IGNORE INTO emails (empresa_id, email) VALUES (?, ?)", email_rows)
+                new_emails = cursor.rowcount if email_rows else 0
+                cursor.executemany("""
+                    UPDATE webs
+                    SET estado_scraping = ?, fecha_ultimo_scraping = CURRENT_TIMESTAMP
+                    WHERE empresa_id = ? AND url = ?
+                """, status_rows)
+            self.batches_committed += 1
+            logging.info(f"Lote guardado: {new_emails} correos nuevos y {len(status_rows)} estados actualizados.")
+        except sqlite3.Error as e:
+            logging.error(f"Error al guardar un lote de {len(batch)} operaciones: {e}")
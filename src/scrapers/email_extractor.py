@@ -0,0 +1,223 @@
+import re
+from collections import namedtuple
+from urllib.parse import unquote, urljoin, urlparse
+
+# Correos y enlaces de contacto encontrados en una página. `contact_links` es
+# una lista de ContactLink ordenada de mayor a menor puntaje.
+PageExtraction = namedtuple('PageExtraction', ['emails', 'contact_links'])
+ContactLink = namedtuple('ContactLink', ['url', 'score'])
+
+# Palabras que delatan una página de contacto, con su peso. Se buscan en la
+# ruta del enlace y en su texto; el puntaje de un enlace es la suma de ambos.
+CONTACT_KEYWORDS = (
+    (r'cont[aá]ct', 10),  # contacto, contact, contáctenos, contactanos...
+    (r'qui[eé]nes[\s_-]*somos', 6),
+    (r'nosotros', 6),
+    (r'about', 5),
+    (r'empresa', 4),
+)
+
+# Extensiones de archivos que aparecen pegadas a una "@" sin ser correos,
+# como logo@2x.png o icons@3x.webp.
+ASSET_EXTENSIONS = frozenset((
+    'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'avif', 'ico', 'bmp', 'tif', 'tiff',
+    'css', 'js', 'map', 'json', 'woff', 'woff2', 'ttf', 'eot', 'otf', 'mp4', 'webm', 'mp3', 'pdf',
+))
+
+# Dominios de correos de ejemplo, plantillas o librerías que nunca son de la empresa.
+IGNORED_EMAIL_DOMAINS = (
+    'example.com', 'example.org', 'domain.com', 'yourdomain.com', 'tudominio.cl', 'tudominio.com',
+    'sentry.io', 'wixpress.com', 'email.com',
+)
+
+_DOT = r'(?:\s*[\[\(\{]\s*(?:dot|punto)\s*[\]\)\}]\s*|\s+(?:dot|punto)\s+|\.)'
+
+# La página se recorre una sola vez saltando de un carácter "disparador" al
+# siguiente; solo alrededor de ellos se aplican expresiones ancladas. Probar
+# una alternancia de expresiones en cada posición del HTML es varias veces
+# más lento en el motor `re`.
+TRIGGER_REGEX = re.compile(r'[<@&\[\(\{]')
+ANCHOR_REGEX = re.compile(r'<a\b([^>]*)>(.{0,500}?)</a\s*>', re.IGNORECASE | re.DOTALL)
+DOMAIN_REGEX = re.compile(r'[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}')
+BRACKET_AT_REGEX = re.compile(r'[\[\(\{]\s*(?:at|arroba)\s*[\]\)\}]', re.IGNORECASE)
+ENTITY_AT_REGEX = re.compile(r'&#0*64;|&#x0*40;', re.IGNORECASE)
+OBFUSCATED_DOMAIN_REGEX = re.compile(r'\s*[A-Za-z0-9-]+(?:' + _DOT + r'[A-Za-z0-9-]+)+', re.IGNORECASE)
+HREF_REGEX = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+CFEMAIL_ATTR_REGEX = re.compile(r'data-cfemail\s*=\s*["\']?([0-9a-fA-F]+)', re.IGNORECASE)
+DOT_REGEX = re.compile(_DOT, re.IGNORECASE)
+TAG_REGEX = re.compile(r'<[^>]+>')
+NON_VISIBLE_REGEX = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+KEYWORD_REGEX = re.compile(
+    '|'.join(f'(?P<k{i}>{pattern})' for i, (pattern, _) in enumerate(CONTACT_KEYWORDS)),
+    re.IGNORECASE
+)
+KEYWORD_WEIGHTS = {f'k{i}': weight for i, (_, weight) in enumerate(CONTACT_KEYWORDS)}
+LOCAL_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-')
+
+
+def clean_email(candidate):
+    """Normaliza un correo candidato y devuelve None si es un falso positivo."""
+    email = candidate.strip().strip('.').lower()
+    if email.count('@') != 1:
+        return None
+    local, domain = email.split('@')
+    if not local or '.' not in domain or '..' in domain:
+        return None
+    if domain.rsplit('.', 1)[1] in ASSET_EXTENSIONS:
+        return None
+    if any(domain == ignored or domain.endswith('.' + ignored) for ignored in IGNORED_EMAIL_DOMAINS):
+        return None
+    return email
+
+
+def decode_cfemail(encoded):
+    """Decodifica un correo protegido por Cloudflare (atributo data-cfemail)."""
+    try:
+        data = bytes.fromhex(encoded)
+    except ValueError:
+        return None
+    if len(data) < 2:
+        return None
+    key = data[0]
+    return ''.join(chr(byte ^ key) for byte in data[1:])
+
+
+def keyword_score(text):
+    """Peso de la palabra de contacto más relevante presente en `text`."""
+    return max((KEYWORD_WEIGHTS[m.lastgroup] for m in KEYWORD_REGEX.finditer(text)), default=0)
+
+
+def same_site(host, site_host):
+    return host.replace('www.', '', 1) == site_host.replace('www.', '', 1)
+
+
+def _href(attrs):
+    found = HREF_REGEX.search(attrs)
+    if not found:
+        return None
+    return next(group for group in found.groups() if group is not None).strip()
+
+
+def visible_text_length(html):
+    """Cantidad aproximada de caracteres de texto visible (sin scripts, estilos ni etiquetas)."""
+    text = TAG_REGEX.sub(' ', NON_VISIBLE_REGEX.sub(' ', html))
+    return len(' '.join(text.split()))
+
+
+def _add_email(emails, candidate):
+    email = clean_email(candidate) if candidate else None
+    if email:
+        emails.add(email)
+
+
+def _local_part_before(html, end, skip_spaces=False):
+    """Parte local de un correo que termina en `end`, o None si no la hay."""
+    if skip_spaces:
+        while end > 0 and html[end - 1].isspace():
+            end -= 1
+    start = end
+    while start > 0 and html[start - 1] in LOCAL_CHARS:
+        start -= 1
+        # Una parte local de más de 64 caracteres no es un correo válido
+        if end - start > 64:
+            return None
+    return html[start:end] if start < end else None
+
+
+def _handle_anchor(found, page_url, site_host, emails, links):
+    attrs, text = found.group(1), found.group(2)
+    for encoded in CFEMAIL_ATTR_REGEX.findall(attrs):
+        _add_email(emails, decode_cfemail(encoded))
+
+    href = _href(attrs)
+    if not href:
+        return
+    lowered = href.lower()
+    if lowered.startswith('mailto:'):
+        for address in unquote(href[7:].split('?', 1)[0]).split(','):
+            _add_email(emails, address)
+        return
+    if '/cdn-cgi/l/email-protection#' in lowered:
+        _add_email(emails, decode_cfemail(href.rsplit('#', 1)[1]))
+        return
+    if lowered.startswith(('tel:', 'javascript:', '#', 'whatsapp:')):
+        return
+
+    # Filtro barato antes de resolver la URL: la mayoría de los enlaces no puntúan
+    text_score = keyword_score(TAG_REGEX.sub(' ', text)) if text else 0
+    if not text_score and not keyword_score(href):
+        return
+
+    url = urljoin(page_url, href).split('#', 1)[0]
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not same_site(parsed.netloc.lower(), site_host):
+        return
+    if parsed.path.rsplit('.', 1)[-1].lower() in ASSET_EXTENSIONS:
+        return
+    score = keyword_score(parsed.path + ' ' + parsed.query) + text_score
+    if score:
+        links[url] = max(score, links.get(url, 0))
+
+
+def extract(html, page_url):
+    """
+    Recorre el HTML una sola vez y devuelve los correos (incluidos enlaces
+    mailto:, correos ofuscados con [at]/(dot) y los protegidos por
+    Cloudflare) y los enlaces del mismo sitio que parecen páginas de
+    contacto, ordenados por relevancia.
+
+    Returns:
+        PageExtraction: (set de correos, lista de ContactLink).
+    """
+    emails = set()
+    links = {}
+    site_host = urlparse(page_url).netloc.lower()
+
+    position = 0
+    while True:
+        trigger = TRIGGER_REGEX.search(html, position)
+        if not trigger:
+            break
+        start = position = trigger.start()
+        char = html[start]
+
+        if char == '@':
+            domain = DOMAIN_REGEX.match(html, start + 1)
+            # Descarta de inmediato los recursos tipo logo@2x.png
+            if domain and domain.group().rsplit('.', 1)[1].lower() in ASSET_EXTENSIONS:
+                domain = None
+            local = _local_part_before(html, start) if domain else None
+            if local:
+                _add_email(emails, f'{local}@{domain.group()}')
+                position = domain.end()
+            else:
+                position = start + 1
+
+        elif char == '<':
+            found = ANCHOR_REGEX.match(html, start) if html[start + 1:start + 2] in ('a', 'A') else None
+            if found:
+                _handle_anchor(found, page_url, site_host, emails, links)
+                # El texto del enlace se sigue recorriendo, puede contener correos
+                position = found.start(2)
+            else:
+                position = start + 1
+
+        else:
+            # Ofuscaciones: "ventas [at] empresa [dot] cl" o "ventas&#64;empresa.cl"
+            at_sign = (ENTITY_AT_REGEX if char == '&' else BRACKET_AT_REGEX).match(html, start)
+            domain = OBFUSCATED_DOMAIN_REGEX.match(html, at_sign.end()) if at_sign else None
+            local = _local_part_before(html, start, skip_spaces=True) if domain else None
+            if local:
+                _add_email(emails, local + '@' + DOT_REGEX.sub('.', domain.group().strip()))
+                position = domain.end()
+            else:
+                position = start + 1
+
+    # Los correos protegidos por Cloudflare también aparecen fuera de enlaces (<span data-cfemail>)
+    if 'data-cfemail' in html:
+        for encoded in CFEMAIL_ATTR_REGEX.findall(html):
+            _add_email(emails, decode_cfemail(encoded))
+
+    # A igual puntaje, primero las rutas más cortas (suelen ser la página principal de contacto)
+    ranked = sorted(links.items(), key=lambda item: (-item[1], len(item[0])))
+    return PageExtraction(emails, [ContactLink(url, score) for url, score in ranked])
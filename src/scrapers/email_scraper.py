@@ -2,14 +2,13 @@ import os
 import sys
 import sqlite3
 import logging
-import re
 import asyncio
-import psutil
+import argparse
 import time
-from urllib.parse import urlparse, urljoin
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, BrowserConfig
-from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
-from bs4 import BeautifulSoup
+from collections import namedtuple
+from urllib.parse import urlparse
+import aiohttp
+from crawl4ai import AsyncWebCrawler, BrowserConfig
 # LXMLWebScrapingStrategy ya no es necesaria al renderizar con JavaScript
 
 # --- Configuración de Logging ---
@@ -19,111 +18,448 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(PROJECT_ROOT)
 
-from src.config import DB_PATH
-
-# --- Expresión Regular para Emails ---
-EMAIL_REGEX = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-
-# --- Lista Negra de Dominios ---
-DOMAIN_BLACKLIST = [
-    'facebook.com',
-    'instagram.com',
-    'twitter.com',
-    'linkedin.com',
-    'youtube.com',
-    'tiktok.com',
-    'google.com',
-    'whatsapp.com',
-    'telegram.org',
-    'w3.org',
-    'sentry.io',
-    'jsdelivr.net'
-]
-
-def normalize_url(url):
-    """Asegura que la URL tenga un esquema, prefiriendo https, y elimina espacios."""
-    if not url:
-        return None
-    url = url.strip()
-    parsed = urlparse(url)
-    if not parsed.scheme:
-        return f'https://{url}'
-    return url
+from src.config import DB_PATH, DOMAIN_BLACKLIST
+from src.processing.url_canonicalizer import ESTADO_PENDIENTE, canonicalize_url, initial_status
+from src.scrapers.contact_discovery import discover_contact_pages
+from src.scrapers.browser_profile import DEFAULT_PROFILE, BrowserProfile, block_requests
+from src.scrapers.crawl_planner import CrawlPlanner
+from src.scrapers.db_writer import DbWriter
+from src.scrapers.email_extractor import PageExtraction, extract, visible_text_length
+from src.scrapers.page_cache import PageCache, content_hash
+from src.scrapers.preflight import DomainPreflight
+from src.scrapers.resource_controller import ConcurrencyController, RECYCLE
+
+# --- Concurrencia ---
+MAX_SITIOS_CONCURRENTES = 20  # Máximo de sitios en proceso a la vez (límite global)
+INTERVALO_CONTROL_S = 10  # Cada cuánto se reevalúa la concurrencia según los recursos
+# Fragmentos de los errores de crawl4ai/Playwright que delatan una falla del
+# navegador local (cierre, caída, falta de memoria) y no del sitio remoto
+ERRORES_NAVEGADOR = ('has been closed', 'crash', 'out of memory', 'browser closed')
+MAX_MEMORIA_MB = None  # Memoria máxima del scraper y su navegador; None = 70% de la RAM
+MAX_PAGINAS_POR_HOST = 2  # Solicitudes simultáneas a un mismo host (cortesía)
+MAX_PAGINAS_PARALELAS_POR_SITIO = 3  # Páginas de contacto de un sitio rastreadas a la vez
+MAX_PAGINAS_POR_SITIO = 6  # Presupuesto de páginas por sitio y nivel de descarga, incluida la principal
+DESCUBRIR_CONTACTO = False  # Buscar páginas de contacto en robots.txt, sitemaps y rutas habituales
+CORREOS_OBJETIVO = 1  # El rastreo de un sitio se detiene al reunir esta cantidad de correos (0 = sin límite)
+
+# --- Caché de páginas y modo refresco ---
+CACHE_PAGINAS_DB = os.path.join(PROJECT_ROOT, 'data', 'database', 'cache_paginas.db')
+CACHE_TTL_DIAS = 180  # Antigüedad máxima de una página en caché
+REFRESCO_DIAS = 90  # En modo refresco, se revisan los sitios rastreados hace más de esto
+TIMEOUT_SITIO_S = 45.0  # Tiempo máximo para el rastreo dirigido de un sitio
+
+# --- Descarga por HTTP (primer nivel) ---
+TIMEOUT_HTTP_S = 10  # Tiempo máximo de una descarga HTTP simple
+MIN_TEXTO_VISIBLE = 200  # Por debajo de esto, una página se considera "solo JavaScript"
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-CL,es;q=0.9,en;q=0.5',
+}
+
+# Trabajo de un dominio: la URL a rastrear y todas las filas (empresa_id, url
+# en la BD) que comparten ese sitio y reciben su resultado.
+SiteWork = namedtuple('SiteWork', ['domain', 'url', 'empresas'])
+
+# Página obtenida: URL final (tras redirecciones), HTML y si se renderizó con el
+# navegador, más los validadores HTTP. `html` es None si el servidor respondió
+# 304 (sin cambios desde la versión en caché).
+PageResult = namedtuple('PageResult', ['url', 'html', 'rendered', 'etag', 'last_modified'], defaults=(None, None))
+
+# Página ya procesada: URL final, su PageExtraction y si parece solo JavaScript.
+ExtractedPage = namedtuple('ExtractedPage', ['url', 'extraction', 'js_only'])
+
+class HostLimiter:
+    """Limita las solicitudes simultáneas a cada host con un semáforo por host."""
+
+    def __init__(self, per_host=MAX_PAGINAS_POR_HOST):
+        self.per_host = per_host
+        self._semaphores = {}
+
+    def for_url(self, url):
+        host = urlparse(url).netloc.lower()
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[host]
+
+def group_by_domain(empresas, writer):
+    """
+    Agrupa las filas (empresa_id, url, url_canonica, dominio) pendientes por
+    dominio registrable, para que un sitio compartido por varias empresas
+    (cadenas, franquicias) se rastree una sola vez. De cada dominio se
+    rastrea su URL canónica más corta, normalmente la página principal.
 
-async def find_emails_on_site(crawler: AsyncWebCrawler, empresa_id: int, base_url: str):
+    Se usan la URL canónica y el dominio guardados al construir la base de
+    datos. Solo las filas que aún no los tienen (bases de datos no
+    reprocesadas) se canonicalizan aquí; si resultan inválidas o en lista
+    negra reciben su estado en vez de quedar pendientes para siempre.
+
+    Returns:
+        list: SiteWork por dominio, en el orden de aparición.
     """
-    Realiza un rastreo dirigido:
-    1. Analiza la página principal y extrae correos.
-    2. Busca enlaces de contacto y páginas relevantes.
-    3. Rastrea esas páginas específicas para encontrar más correos.
+    sites = {}
+    for empresa_id, website_from_db, url_canonica, dominio in empresas:
+        if url_canonica is None:
+            canonical = canonicalize_url(website_from_db)
+            status = initial_status(canonical, DOMAIN_BLACKLIST)
+            if status != ESTADO_PENDIENTE:
+                logging.info(f"[Empresa ID: {empresa_id}] '{website_from_db}': {status}.")
+                writer.update_status(empresa_id, website_from_db, status)
+                continue
+            url_canonica, dominio = canonical.url, canonical.dominio
+        site = sites.get(dominio)
+        if site is None:
+            sites[dominio] = SiteWork(dominio, url_canonica, [(empresa_id, website_from_db)])
+            continue
+        site.empresas.append((empresa_id, website_from_db))
+        if len(url_canonica) < len(site.url):
+            sites[dominio] = site._replace(url=url_canonica)
+    return list(sites.values())
+
+class PageFetcher:
     """
-    all_emails = set()
-    urls_to_crawl = set()
-    processed_urls = set()
+    Descarga páginas por niveles. El primer nivel es un GET HTTP simple sobre
+    una sesión aiohttp compartida (pool de conexiones, keep-alive y
+    compresión); el navegador de crawl4ai solo se usa cuando se pide
+    explícitamente renderizar, y se inicia la primera vez que hace falta.
+    Ambos niveles respetan el límite por host. Con una PageCache, las
+    descargas HTTP son condicionales y las páginas sin cambios no se
+    vuelven a extraer. El navegador sigue el perfil liviano compartido
+    (`profile`): bloquea imágenes, fuentes y rastreadores, y se renueva
+    cada `profile.recycle_every` páginas renderizadas.
 
-    # 1. Rastrear la página principal para buscar correos y enlaces de contacto
-    try:
-        logging.info(f"[Empresa ID: {empresa_id}] Analizando página principal: {base_url}")
-        main_page_result = await crawler.arun(base_url)
-        processed_urls.add(base_url)
-
-        if main_page_result and main_page_result.success and main_page_result.html:
-            # Extraer correos de la página principal
-            found_on_main = EMAIL_REGEX.findall(main_page_result.html)
-            if found_on_main:
-                all_emails.update(email.lower() for email in found_on_main)
-
-            # Buscar enlaces de contacto con BeautifulSoup
-            soup = BeautifulSoup(main_page_result.html, 'html.parser')
-            contact_keywords = ['contacto', 'contact', 'nosotros', 'quienes-somos', 'about', 'empresa']
-            
-            for link in soup.find_all('a', href=True):
-                href = link['href'].lower()
-                link_text = link.get_text().lower()
-                
-                if any(keyword in href for keyword in contact_keywords) or any(keyword in link_text for keyword in contact_keywords):
-                    full_url = urljoin(base_url, link['href'])
-                    if urlparse(full_url).netloc == urlparse(base_url).netloc:
-                        urls_to_crawl.add(full_url)
+    Con un ConcurrencyController (`controller`), cada renderizado le informa
+    si el navegador local falló. Los errores de los sitios (DNS, 4xx/5xx,
+    tiempos de espera, páginas sin correos) no se informan: no dependen de
+    la concurrencia y reducirla no los evita.
+    """
 
-    except Exception as e:
-        logging.error(f"[Empresa ID: {empresa_id}] Error analizando la página principal {base_url}: {e}")
-        return all_emails # Devolver lo encontrado hasta ahora
+    def __init__(self, session: aiohttp.ClientSession, host_limiter: HostLimiter, browser_config: BrowserConfig,
+                 cache: PageCache = None, profile: BrowserProfile = DEFAULT_PROFILE,
+                 controller: ConcurrencyController = None):
+        self.session = session
+        self.host_limiter = host_limiter
+        self.browser_config = browser_config
+        self.cache = cache
+        self.profile = profile
+        self.controller = controller
+        self._recycle_task = None
+        self.stats = {'http': 0, 'navegador': 0, 'reciclajes': 0, 'descubrimiento': 0, 'sin_cambios': 0,
+                      'fallos_navegador': 0}
+        self._crawler = None
+        self._crawler_lock = asyncio.Lock()
+        self._renders = {}  # Renderizados en curso por instancia de navegador
 
-    # 2. Rastrear las páginas de contacto encontradas
-    urls_to_crawl.discard(base_url) # Evitar rastrear la página principal de nuevo
+    async def fetch_extracted(self, url, render=False):
+        """
+        Descarga una página y extrae sus correos y enlaces de contacto. Con
+        caché, la descarga HTTP lleva If-None-Match / If-Modified-Since y la
+        extracción guardada se reutiliza si el servidor responde 304 o el
+        contenido no cambió. Las páginas renderizadas no pasan por la caché.
 
-    if not urls_to_crawl:
-        logging.info(f"[Empresa ID: {empresa_id}] No se encontraron enlaces de contacto. Se revisó solo la página principal.")
-        return all_emails
+        Returns:
+            ExtractedPage, o None si la página no se pudo obtener como HTML.
+        """
+        cache = None if render else self.cache
+        cached = cache.get(url) if cache else None
+        headers = {}
+        if cached and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
 
-    logging.info(f"[Empresa ID: {empresa_id}] Rastreando páginas de contacto encontradas: {urls_to_crawl}")
+        async with self.host_limiter.for_url(url):
+            page = await self._render(url) if render else await self._get(url, headers)
+        if page is None:
+            return None
+        if page.html is None:
+            self.stats['sin_cambios'] += 1
+            cache.touch(cached)
+            return ExtractedPage(cached.final_url, cached.extraction, cached.js_only)
 
-    for url in urls_to_crawl:
-        if url in processed_urls:
-            continue
+        hash_value = content_hash(page.html) if cache else None
+        if cached and cached.content_hash == hash_value:
+            self.stats['sin_cambios'] += 1
+            extraction, js_only = cached.extraction, cached.js_only
+        else:
+            extraction, js_only = extract(page.html, page.url), looks_js_only(page.html)
+        if cache:
+            cache.put(url, page.url, page.etag, page.last_modified, hash_value, extraction, js_only)
+        return ExtractedPage(page.url, extraction, js_only)
+
+    async def _get(self, url, headers=None):
         try:
-            logging.info(f"[Empresa ID: {empresa_id}] Rastreado página de contacto: {url}")
+            async with self.session.get(url, allow_redirects=True, headers=headers) as response:
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+                if response.status == 304:
+                    return PageResult(str(response.url), None, False, etag, last_modified)
+                content_type = response.headers.get('Content-Type', '')
+                if response.status >= 400 or 'html' not in content_type.lower():
+                    return None
+                html = await response.text(errors='replace')
+                self.stats['http'] += 1
+                return PageResult(str(response.url), html, False, etag, last_modified)
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+            logging.debug(f"Descarga HTTP fallida para {url}: {e}")
+            return None
+
+    async def fetch_text(self, url, max_bytes=None):
+        """Descarga un recurso de texto (robots.txt, sitemap) por HTTP, hasta `max_bytes`; None si falla."""
+        async with self.host_limiter.for_url(url):
+            try:
+                async with self.session.get(url, allow_redirects=True) as response:
+                    if response.status >= 400:
+                        return None
+                    self.stats['descubrimiento'] += 1
+                    if max_bytes is None:
+                        return await response.text(errors='replace')
+                    data = bytearray()
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        data.extend(chunk)
+                        if len(data) >= max_bytes:
+                            break
+                    return bytes(data[:max_bytes]).decode(response.charset or 'utf-8', errors='replace')
+            except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+                logging.debug(f"Descarga de {url} fallida: {e}")
+                return None
+
+    async def probe(self, url):
+        """Comprueba con una petición HEAD que una página HTML existe; devuelve su URL final o None."""
+        async with self.host_limiter.for_url(url):
+            try:
+                async with self.session.head(url, allow_redirects=True) as response:
+                    self.stats['descubrimiento'] += 1
+                    content_type = response.headers.get('Content-Type', '')
+                    if response.status >= 400 or 'html' not in content_type.lower():
+                        return None
+                    return str(response.url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.debug(f"Prueba HEAD fallida para {url}: {e}")
+                return None
+
+    async def _get_crawler(self):
+        async with self._crawler_lock:
+            if self._crawler is None:
+                self._crawler = AsyncWebCrawler(config=self.browser_config)
+                self._crawler.crawler_strategy.set_hook('on_page_context_created', self._on_page_created)
+                await self._crawler.start()
+            return self._crawler
+
+    async def _on_page_created(self, page, context, **kwargs):
+        # Solo interesa el HTML: imágenes, fuentes y rastreadores no se descargan
+        await block_requests(page, self.profile)
+        return page
+
+    async def _render(self, url):
+        crawler = None
+        try:
+            crawler = await self._get_crawler()
+            self._renders[crawler] = self._renders.get(crawler, 0) + 1
             result = await crawler.arun(url)
-            if result and result.success and result.html:
-                found = EMAIL_REGEX.findall(result.html)
-                if found:
-                    all_emails.update(email.lower() for email in found)
-            processed_urls.add(url)
-        except Exception as e:
-            logging.error(f"[Empresa ID: {empresa_id}] Error rastreando la página de contacto {url}: {e}")
+        except Exception:
+            self._record_render(False)
+            raise
+        finally:
+            if crawler is not None:
+                self._renders[crawler] -= 1
+        error = (getattr(result, 'error_message', None) or '').lower() if result else ''
+        self._record_render(not any(fragment in error for fragment in ERRORES_NAVEGADOR))
+        if result and result.success and result.html:
+            self.stats['navegador'] += 1
+            if self.profile.recycle_every and self.stats['navegador'] % self.profile.recycle_every == 0:
+                # Renovación periódica, en segundo plano: espera a los renderizados en curso
+                if self._recycle_task is None or self._recycle_task.done():
+                    self._recycle_task = asyncio.ensure_future(self.recycle_browser())
+            return PageResult(url, result.html, True)
+        return None
+
+    def _record_render(self, ok):
+        # Solo las fallas del navegador local cuentan para el control de concurrencia
+        if not ok:
+            self.stats['fallos_navegador'] += 1
+        if self.controller is not None:
+            self.controller.record(ok)
+
+    async def recycle_browser(self):
+        """
+        Cierra el navegador actual en cuanto terminan sus renderizados en curso;
+        el siguiente renderizado inicia uno nuevo, libre de la memoria acumulada.
+        """
+        async with self._crawler_lock:
+            crawler, self._crawler = self._crawler, None
+        if crawler is None:
+            return
+        while self._renders.get(crawler, 0) > 0:
+            await asyncio.sleep(0.5)
+        self._renders.pop(crawler, None)
+        await crawler.close()
+        self.stats['reciclajes'] += 1
+
+    async def close(self):
+        if self._recycle_task is not None:
+            await self._recycle_task
+        await self.recycle_browser()
+
+def create_http_session():
+    """Sesión HTTP compartida por todos los workers, con pool de conexiones acotado."""
+    connector = aiohttp.TCPConnector(
+        limit=MAX_SITIOS_CONCURRENTES * MAX_PAGINAS_POR_HOST,
+        limit_per_host=MAX_PAGINAS_POR_HOST,
+        ttl_dns_cache=300
+    )
+    # aiohttp ya anuncia y descomprime gzip/deflate (y br si está instalado brotli)
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HTTP_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=TIMEOUT_HTTP_S)
+    )
+
+def looks_js_only(html):
+    """Indica si una página parece un cascarón que solo muestra contenido con JavaScript."""
+    return visible_text_length(html) < MIN_TEXTO_VISIBLE
+
+async def crawl_candidates(fetcher: PageFetcher, label: str, planner: CrawlPlanner, render: bool,
+                           max_parallel_pages: int = MAX_PAGINAS_PARALELAS_POR_SITIO):
+    """
+    Descarga las páginas candidatas del plan por prioridad, hasta
+    `max_parallel_pages` a la vez; cada una puede aportar nuevas candidatas.
+    Termina cuando el plan se cumple, se agota el presupuesto o no quedan candidatas.
+    """
+    async def crawl_contact_page(url):
+        logging.info(f"[{label}] Rastreando página de contacto: {url}")
+        page = await fetcher.fetch_extracted(url, render=render)
+        return page.extraction if page else None
+
+    in_flight = {}
+    try:
+        while True:
+            while len(in_flight) < max_parallel_pages:
+                url = planner.next_url()
+                if url is None:
+                    break
+                in_flight[asyncio.ensure_future(crawl_contact_page(url))] = url
+            if not in_flight:
+                break
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url = in_flight.pop(task)
+                try:
+                    extraction = task.result()
+                except Exception as e:
+                    logging.error(f"[{label}] Error rastreando la página de contacto {url}: {e}")
+                    continue
+                if extraction:
+                    planner.add_page(extraction)
+            if planner.satisfied:
+                break
+    finally:
+        # Al alcanzar el objetivo (o si se agota el tiempo del sitio) se abandonan las descargas en curso
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+async def crawl_site(fetcher: PageFetcher, label: str, base_url: str, render: bool, seeds=(),
+                     max_parallel_pages: int = MAX_PAGINAS_PARALELAS_POR_SITIO,
+                     page_budget: int = MAX_PAGINAS_POR_SITIO, email_target: int = CORREOS_OBJETIVO):
+    """
+    Rastrea la página principal y sus páginas de contacto con un nivel de
+    descarga. Las candidatas se descargan por prioridad, hasta
+    `max_parallel_pages` a la vez y como máximo `page_budget` páginas, y el
+    rastreo se detiene en cuanto se reúnen `email_target` correos. Las
+    páginas de contacto ya conocidas (`seeds`, p. ej. del sitemap) se
+    rastrean antes que la principal, que se omite si ellas bastan.
+
+    Returns:
+        tuple: (correos encontrados, True si la página principal parece solo JavaScript).
+    """
+    planner = CrawlPlanner(page_budget, email_target)
+    nivel = 'navegador' if render else 'HTTP'
+    # La página principal siempre tiene su lugar reservado en el presupuesto
+    planner.start(base_url)
+
+    # 1. Rastrear primero las páginas de contacto descubiertas
+    if seeds:
+        planner.add_page(PageExtraction(set(), list(seeds)))
+        await crawl_candidates(fetcher, label, planner, render, max_parallel_pages)
+        if planner.satisfied:
+            logging.info(f"[{label}] Correos encontrados en páginas descubiertas ({nivel}); se omite la página principal.")
+            return planner.emails, False
+
+    # 2. Rastrear la página principal para buscar correos y enlaces de contacto
+    try:
+        logging.info(f"[{label}] Analizando página principal ({nivel}): {base_url}")
+        main_page = await fetcher.fetch_extracted(base_url, render=render)
+        if main_page is None:
+            return planner.emails, True
+        planner.mark_visited(main_page.url)
 
-    return all_emails
+        # Correos y enlaces de contacto del mismo sitio, extraídos en una sola pasada
+        planner.add_page(main_page.extraction)
 
+        # Un cascarón JS no tiene enlaces útiles: no tiene sentido seguir por HTTP
+        if not render and main_page.js_only:
+            return planner.emails, True
 
+    except Exception as e:
+        logging.error(f"[{label}] Error analizando la página principal {base_url}: {e}")
+        return planner.emails, False # Devolver lo encontrado hasta ahora
+
+    if planner.satisfied:
+        logging.info(f"[{label}] Correos encontrados en la página principal; no se rastrean más páginas de contacto.")
+        return planner.emails, False
+    if not planner.has_pending():
+        logging.info(f"[{label}] No quedan enlaces de contacto por revisar tras la página principal.")
+        return planner.emails, False
+
+    # 3. Rastrear las páginas de contacto enlazadas por prioridad
+    await crawl_candidates(fetcher, label, planner, render, max_parallel_pages)
+    logging.info(f"[{label}] {planner.pages_planned} páginas revisadas ({nivel}), {len(planner.emails)} correos.")
+    return planner.emails, False
+
+async def find_emails_on_site(fetcher: PageFetcher, label: str, base_url: str, discover: bool = False):
+    """
+    Realiza un rastreo dirigido en dos niveles:
+    1. Descarga por HTTP la página principal y sus páginas de contacto y extrae correos.
+    2. Solo si eso no da correos (o la página parece solo JavaScript), repite
+       el rastreo renderizando con el navegador.
+    Con `discover`, antes se buscan páginas de contacto en robots.txt, los
+    sitemaps y las rutas habituales, y ambos niveles las rastrean primero.
+    """
+    seeds = []
+    if discover:
+        seeds = await discover_contact_pages(fetcher, base_url)
+        if seeds:
+            logging.info(f"[{label}] Páginas de contacto descubiertas: {[link.url for link in seeds]}")
+
+    emails, js_only = await crawl_site(fetcher, label, base_url, render=False, seeds=seeds)
+    if emails:
+        return emails
+
+    motivo = 'la página parece solo JavaScript' if js_only else 'no se encontraron correos por HTTP'
+    logging.info(f"[{label}] Renderizando con el navegador: {motivo}.")
+    emails, _ = await crawl_site(fetcher, label, base_url, render=True, seeds=seeds)
+    return emails
+
+def canonical_columns(cursor):
+    """
+    Columnas de URL canónica y dominio para las consultas de webs. Las bases de
+    datos aún no reprocesadas por build_database no las tienen: se devuelven
+    como NULL y `group_by_domain` canonicaliza esas filas al vuelo.
+    """
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(webs)")}
+    if {'url_canonica', 'dominio'} <= columns:
+        return "w.url_canonica, w.dominio"
+    logging.warning("La tabla webs no tiene URL canónica ni dominio (ejecuta build_database); se calculan al vuelo.")
+    return "NULL AS url_canonica, NULL AS dominio"
 
 def get_empresas_pendientes_de_scrapeo():
     """Obtiene empresas cuyo estado de scraping es 'pendiente'."""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    query = """
-        SELECT e.id, w.url
+    query = f"""
+        SELECT e.id, w.url, {canonical_columns(cursor)}
         FROM empresas e
         JOIN webs w ON e.id = w.empresa_id
         WHERE w.estado_scraping = 'pendiente'
@@ -135,100 +471,200 @@ def get_empresas_pendientes_de_scrapeo():
     logging.info(f"Encontradas {len(empresas)} empresas pendientes de scrapeo.")
     return empresas
 
-def save_emails(empresa_id, emails):
-    """Guarda una lista de correos para una empresa en la BD."""
-    if not emails:
-        return
-
+def get_empresas_para_refrescar(refresh_days):
+    """
+    Obtiene las empresas ya rastreadas con éxito hace más de `refresh_days`
+    días, para volver a buscar sus correos (modo refresco).
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    for email in emails:
-        try:
-            # Se omite fecha_creacion porque la tabla la añade por defecto
-            cursor.execute("INSERT INTO emails (empresa_id, email) VALUES (?, ?)", (empresa_id, email))
-            logging.info(f"Email '{email}' guardado para la empresa ID {empresa_id}.")
-        except sqlite3.IntegrityError:
-            logging.warning(f"Email '{email}' ya existe para la empresa ID {empresa_id}.")
-    conn.commit()
+
+    query = f"""
+        SELECT e.id, w.url, {canonical_columns(cursor)}
+        FROM empresas e
+        JOIN webs w ON e.id = w.empresa_id
+        WHERE w.estado_scraping IN ('exitoso_con_email', 'exitoso_sin_email')
+          AND (w.fecha_ultimo_scraping IS NULL OR w.fecha_ultimo_scraping < datetime('now', ?))
+    """
+
+    cursor.execute(query, (f'-{refresh_days} days',))
+    empresas = cursor.fetchall()
     conn.close()
+    logging.info(f"Encontradas {len(empresas)} empresas rastreadas hace más de {refresh_days} días para refrescar.")
+    return empresas
 
-def update_scraping_status(empresa_id, url, status):
-    """Actualiza el estado de scraping de una web en la BD."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+async def process_site(fetcher, writer, site, discover=False):
+    """
+    Rastrea una vez el sitio de un dominio y reparte los correos y el estado
+    resultante entre todas las empresas que lo comparten.
+
+    Returns:
+        bool: False si el rastreo falló o excedió el tiempo límite.
+    """
+    label = f"Dominio: {site.domain}"
+    if len(site.empresas) > 1:
+        logging.info(f"[{label}] Sitio compartido por {len(site.empresas)} empresas; se rastrea una sola vez.")
+
+    ok = False
     try:
-        cursor.execute("""
-            UPDATE webs 
-            SET estado_scraping = ?, fecha_ultimo_scraping = CURRENT_TIMESTAMP 
-            WHERE empresa_id = ? AND url = ?
-        """, (status, empresa_id, url))
-        conn.commit()
-        logging.info(f"Estado de scraping actualizado a '{status}' para la empresa ID {empresa_id} y URL {url}.")
-    except sqlite3.Error as e:
-        logging.error(f"Error al actualizar el estado de scraping para la empresa ID {empresa_id}: {e}")
-    finally:
-        conn.close()
+        # El timeout envuelve todo el proceso de rastreo dirigido para un sitio.
+        emails = await asyncio.wait_for(
+            find_emails_on_site(fetcher, label, site.url, discover),
+            timeout=TIMEOUT_SITIO_S
+        )
+        if emails:
+            logging.info(f"[{label}] {len(emails)} correos encontrados en {site.url}")
+            status = 'exitoso_con_email'
+        else:
+            logging.info(f"[{label}] No se encontraron correos en {site.url}")
+            status = 'exitoso_sin_email'
+        ok = True
+
+    except asyncio.TimeoutError:
+        logging.warning(f"[{label}] El procesamiento de {site.url} excedió el tiempo límite de {TIMEOUT_SITIO_S:.0f}s. Omitiendo.")
+        emails, status = set(), 'fallido'
+    except Exception as e:
+        logging.error(f"[{label}] Error al procesar {site.url}: {e}")
+        emails, status = set(), 'fallido'
+
+    for empresa_id, website_from_db in site.empresas:
+        writer.save_emails(empresa_id, emails)
+        writer.update_status(empresa_id, website_from_db, status)
+    return ok
+
+def preflight_target(url):
+    """(host, puerto) de una URL para la verificación previa; puerto None si no lo indica."""
+    parsed = urlparse(url)
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    return parsed.hostname, port
+
+async def preflight_sites(sites, writer):
+    """
+    Resuelve y conecta en paralelo con todos los dominios antes de rastrear.
+    Los inaccesibles reciben de inmediato su estado (dominio_inexistente o
+    sin_conexion) y se devuelven solo los sitios que vale la pena rastrear.
+    """
+    started = time.monotonic()
+    # Se verifica el host que se rastreará (no el dominio registrable: puede ser
+    # un subdominio, o solo resolver con 'www.') y el puerto explícito de la URL
+    targets = {site.url: preflight_target(site.url) for site in sites}
+    verdicts = await DomainPreflight().check_all(set(targets.values()))
+    reachable = []
+    descartados = {}
+    for site in sites:
+        result = verdicts.get(targets[site.url])
+        if result is None or result.status is None:
+            reachable.append(site)
+            continue
+        descartados[result.status] = descartados.get(result.status, 0) + 1
+        logging.info(f"[Dominio: {site.domain}] {result.status}: {result.detail}")
+        for empresa_id, website_from_db in site.empresas:
+            writer.update_status(empresa_id, website_from_db, result.status)
+    logging.info(f"Verificación previa de {len(sites)} dominios en {time.monotonic() - started:.1f}s: descartados {descartados or 0}.")
+    return reachable
 
-async def main():
-    """Función principal para orquestar el scraping de emails con manejo de recursos."""
+async def main(concurrency=MAX_SITIOS_CONCURRENTES, max_memory_mb=MAX_MEMORIA_MB, discover=DESCUBRIR_CONTACTO,
+               refresh_days=None, use_cache=True):
+    """
+    Función principal: hasta `concurrency` workers toman empresas de una cola
+    de pendientes y las procesan en paralelo. Cuántos trabajan a la vez lo
+    decide un ConcurrencyController según la memoria del scraper y su
+    navegador, la carga de CPU y la tasa de fallos del navegador; si la memoria sigue alta
+    con el mínimo de concurrencia, el navegador se recicla. Con `discover`,
+    las páginas de contacto se buscan primero en robots.txt, los sitemaps y
+    las rutas habituales. Con `refresh_days`, en vez de las pendientes se
+    vuelven a rastrear las webs exitosas más antiguas que eso; la caché de
+    páginas hace que las que no cambiaron cuesten una petición condicional.
+    """
     logging.info("--- Iniciando Fase 2: Scraper de Correos con crawl4ai ---")
     
-    empresas = get_empresas_pendientes_de_scrapeo()
-    
-    # --- Lógica de Chunks y Monitoreo ---
-    chunk_size = 50 # Procesar de 50 en 50 para acelerar el proceso
-    total_empresas = len(empresas)
-    logging.info(f"Se procesarán {total_empresas} empresas en lotes de {chunk_size}.")
+    if refresh_days is None:
+        empresas = get_empresas_pendientes_de_scrapeo()
+    else:
+        empresas = get_empresas_para_refrescar(refresh_days)
+    controller = ConcurrencyController(
+        max_limit=concurrency, initial=max(1, concurrency // 2),
+        memory_limit_mb=max_memory_mb, adjust_interval=INTERVALO_CONTROL_S
+    )
+
+    queue = asyncio.Queue()
+    host_limiter = HostLimiter()
+    processed = 0
 
-    # Habilitar JavaScript para renderizar contenido dinámico
+    # Habilitar JavaScript para renderizar contenido dinámico, con el perfil liviano compartido
     browser_config = BrowserConfig(
-        headless=True,
+        headless=DEFAULT_PROFILE.headless,
         java_script_enabled=True
     )
 
-    # La configuración de rastreo profundo (deep_crawl_strategy) ya no es necesaria aquí,
-    # la nueva función find_emails_on_site implementa una lógica de rastreo dirigido.
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        for i in range(0, total_empresas, chunk_size):
-            chunk = empresas[i:i + chunk_size]
-            logging.info(f"--- Procesando Lote {i//chunk_size + 1}/{(total_empresas + chunk_size - 1)//chunk_size} (Empresas {i+1}-{min(i+chunk_size, total_empresas)}) ---")
-            
+    # Un único escritor agrupa correos y estados en transacciones por lotes
+    with DbWriter(DB_PATH) as writer:
+        sites = group_by_domain(empresas, writer)
+        total_sitios = len(sites)
+        logging.info(f"Se procesarán {len(empresas)} empresas en {total_sitios} sitios, con hasta {concurrency} sitios en paralelo (inicialmente {controller.limit}).")
+        for site in await preflight_sites(sites, writer):
+            queue.put_nowait(site)
 
+        cache = PageCache(CACHE_PAGINAS_DB, ttl_days=CACHE_TTL_DIAS) if use_cache else None
+        if cache:
+            logging.info(f"Caché de páginas: {cache.evict_expired()} entradas vencidas eliminadas.")
 
-            for empresa_id, website_from_db in chunk:
-                website = normalize_url(website_from_db)
-                if not website:
-                    logging.warning(f"[Empresa ID: {empresa_id}] URL inválida: '{website_from_db}'. Omitiendo.")
-                    continue
+        async with create_http_session() as session:
+            fetcher = PageFetcher(session, host_limiter, browser_config, cache, controller=controller)
 
-                domain = urlparse(website).netloc.replace('www.', '')
-                if any(blacklisted_domain in domain for blacklisted_domain in DOMAIN_BLACKLIST):
-                    logging.info(f"[Empresa ID: {empresa_id}] Omitiendo {domain} (lista negra).")
-                    continue
-                
-                try:
-                    # El timeout envuelve todo el proceso de rastreo dirigido para un sitio.
-                    emails = await asyncio.wait_for(
-                        find_emails_on_site(crawler, empresa_id, website),
-                        timeout=45.0  # Aumentado a 45s para dar tiempo al rastreo de 2-3 páginas
-                    )
-                    if emails:
-                        save_emails(empresa_id, emails)
-                        update_scraping_status(empresa_id, website, 'exitoso_con_email')
-                    else:
-                        logging.info(f"[Empresa ID: {empresa_id}] No se encontraron correos en {website}")
-                        update_scraping_status(empresa_id, website, 'exitoso_sin_email')
-
-                except asyncio.TimeoutError:
-                    logging.warning(f"[Empresa ID: {empresa_id}] El procesamiento de {website} excedió el tiempo límite de 45s. Omitiendo.")
-                    update_scraping_status(empresa_id, website, 'fallido')
-                except Exception as e:
-                    logging.error(f"[Empresa ID: {empresa_id}] Error al procesar {website}: {e}")
-                    update_scraping_status(empresa_id, website, 'fallido')
+            async def worker(worker_id):
+                nonlocal processed
+                while not queue.empty():
+                    # Los workers por encima del límite actual esperan sin tomar trabajo
+                    if worker_id >= controller.limit:
+                        await asyncio.sleep(1)
+                        continue
+                    try:
+                        site = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await process_site(fetcher, writer, site, discover)
+                    processed += 1
+                    if processed % 50 == 0:
+                        logging.info(f"--- Progreso: {processed}/{total_sitios} sitios procesados ---")
+
+            async def monitor():
+                while True:
+                    await asyncio.sleep(INTERVALO_CONTROL_S)
+                    if controller.adjust(force=True) == RECYCLE:
+                        logging.warning("Memoria alta con la concurrencia mínima: reciclando el navegador.")
+                        await fetcher.recycle_browser()
+
+            monitor_task = asyncio.create_task(monitor())
+            try:
+                await asyncio.gather(*(worker(i) for i in range(max(1, concurrency))))
+            finally:
+                monitor_task.cancel()
+                await fetcher.close()
+                if cache:
+                    cache.close()
+
+        logging.info(f"Páginas obtenidas por HTTP: {fetcher.stats['http']}, renderizadas con navegador: {fetcher.stats['navegador']}, reciclajes del navegador: {fetcher.stats['reciclajes']}, fallos del navegador: {fetcher.stats['fallos_navegador']}, peticiones de descubrimiento: {fetcher.stats['descubrimiento']}, páginas sin cambios (caché): {fetcher.stats['sin_cambios']}.")
 
-            if i + chunk_size < total_empresas:
-                logging.info("Pausa de 15 segundos entre lotes para liberar recursos.")
-                time.sleep(15)
+    logging.info(f"--- Fase 2 finalizada: {processed} sitios procesados ---")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Scraper de correos para los sitios web pendientes.")
+    parser.add_argument('--concurrencia', type=int, default=MAX_SITIOS_CONCURRENTES,
+                        help='Número máximo de sitios procesados en paralelo.')
+    parser.add_argument('--max-memoria-mb', type=float, default=MAX_MEMORIA_MB,
+                        help='Memoria máxima del scraper y su navegador, en MB (por defecto, 70%% de la RAM).')
+    parser.add_argument('--descubrir-contacto', action='store_true', default=DESCUBRIR_CONTACTO,
+                        help='Buscar páginas de contacto en robots.txt, sitemaps y rutas habituales (/contacto, /contact) antes de la página principal.')
+    parser.add_argument('--refrescar', action='store_true',
+                        help='Modo refresco: volver a rastrear las webs exitosas rastreadas hace más de --refrescar-dias días.')
+    parser.add_argument('--refrescar-dias', type=float, default=REFRESCO_DIAS,
+                        help='Antigüedad mínima, en días, de las webs que se refrescan.')
+    parser.add_argument('--sin-cache', action='store_true',
+                        help='No usar la caché de páginas (descargas completas, sin peticiones condicionales).')
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrencia, args.max_memoria_mb, args.descubrir_contacto,
+                     refresh_days=args.refrescar_dias if args.refrescar else None, use_cache=not args.sin_cache))
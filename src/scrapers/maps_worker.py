@@ -0,0 +1,315 @@
+import csv
+import json
+import logging
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.scrapers.resource_controller import RECYCLE, SHRINK
+
+
+class WorkerError(Exception):
+    """Raised when the scraper worker reports an error or dies mid-query."""
+
+
+class WorkerTimeout(WorkerError):
+    """Raised when a query exceeds its time budget. The worker is killed."""
+
+
+# Outcome of one query run by MapsWorkerPool. `error` is None on success,
+# otherwise the exception raised (and `places` is None). `stats` holds the
+# worker's counters for the query (found, skipped...) and the `positions`
+# (lat, lng) of the listings found; a failed query keeps those reported
+# before it failed, e.g. `found` once its feed was scrolled.
+QueryResult = namedtuple('QueryResult', ['query', 'places', 'error', 'duration', 'stats'])
+
+
+class MapsWorker:
+    """
+    Drives a long-lived `main.py --serve` process of the vendor scraper.
+
+    One browser is kept alive across queries; requests are written to the
+    worker's stdin as JSON lines and its events are read back from stdout.
+    If a query times out or the worker dies, the process is killed and
+    transparently restarted on the next query.
+    """
+
+    def __init__(self, python_path, script_path, cwd, worker_args=None, startup_timeout=90):
+        self.python_path = python_path
+        self.script_path = script_path
+        self.cwd = cwd
+        self.worker_args = list(worker_args or [])
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self._events = None
+        self._next_id = 0
+        self.last_stats = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Starts the worker and waits until its browser is ready."""
+        command = [self.python_path, self.script_path, '--serve'] + self.worker_args
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding='utf-8',
+            bufsize=1, cwd=self.cwd, start_new_session=(os.name == 'posix')
+        )
+        self._events = queue.Queue()
+        reader = threading.Thread(target=self._read_events, args=(self.process, self._events), daemon=True)
+        reader.start()
+
+        try:
+            event = self._next_event(time.monotonic() + self.startup_timeout)
+        except queue.Empty:
+            event = None
+        if event is None or event.get('event') != 'ready':
+            self.kill()
+            raise WorkerError(f"Scraper worker failed to start (got {event!r})")
+        logging.info(f"Scraper worker started (pid {self.process.pid}).")
+
+    @staticmethod
+    def _read_events(process, events):
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.put(json.loads(line))
+            except ValueError:
+                logging.debug(f"Ignoring non-protocol worker output: {line}")
+        events.put(None)  # EOF: the worker exited
+
+    def _next_event(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise queue.Empty
+        return self._events.get(timeout=remaining)
+
+    def run_query(self, query, total, timeout=120, output=None, append=False, on_place=None):
+        """
+        Runs one search on the worker and returns the extracted places as dicts.
+
+        Args:
+            query (str): The Google Maps search string, or a TileQuery to search
+                within a map viewport.
+            total (int): Maximum number of results to extract.
+            timeout (int): Seconds allowed for the query, excluding browser startup.
+            output (str): Optional CSV path the worker writes the results to.
+            append (bool): Append to `output` instead of overwriting it.
+            on_place (callable): Called with each place dict as it is streamed back.
+
+        Raises:
+            WorkerTimeout: If the query did not finish within `timeout`.
+            WorkerError: If the worker reported an error or exited.
+        """
+        if not self.is_alive():
+            self.start()
+
+        self._next_id += 1
+        request_id = self._next_id
+        self.last_stats = {}
+        # Tile queries (TileQuery) carry the search text and the map viewport
+        # separately; plain strings are searched as typed.
+        request = {'id': request_id, 'search': getattr(query, 'search', query), 'total': total}
+        if getattr(query, 'viewport', None):
+            request['viewport'] = list(query.viewport)
+        if output:
+            request.update({'output': output, 'append': append})
+        try:
+            self.process.stdin.write(json.dumps(request, ensure_ascii=False) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise WorkerError(f"Could not send query to the worker: {e}")
+
+        places = []
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                event = self._next_event(deadline)
+            except queue.Empty:
+                self.kill()
+                raise WorkerTimeout(f"Query timed out after {timeout} seconds")
+            if event is None:
+                self.kill()
+                raise WorkerError("Scraper worker exited unexpectedly")
+            if event.get('id') != request_id:
+                continue
+            kind = event.get('event')
+            if kind == 'place':
+                places.append(event['place'])
+                if on_place:
+                    on_place(event['place'])
+            elif kind in ('found', 'done'):
+                self.last_stats.update({k: v for k, v in event.items() if k not in ('event', 'id')})
+                if kind == 'done':
+                    return places
+            elif kind == 'error':
+                raise WorkerError(event.get('error', 'unknown error'))
+
+    def kill(self):
+        """Kills the worker together with its browser processes."""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                if os.name == 'posix':
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                else:
+                    self.process.kill()
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+        self.process = None
+
+    def close(self):
+        """Asks the worker to exit by closing its stdin, killing it if it does not."""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+class MapsWorkerPool:
+    """
+    Runs queries on up to `size` MapsWorker processes at once, each with its
+    own browser. Workers are started lazily on their first query. Results are
+    handed back to the calling thread, which is the only one writing output.
+    """
+
+    def __init__(self, size, python_path, script_path, cwd, worker_args=None, pause_between_queries=0):
+        self.size = max(1, size)
+        self.pause_between_queries = pause_between_queries
+        self._workers = [MapsWorker(python_path, script_path, cwd, worker_args) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run_on_idle_worker(self, query, total, timeout, on_place):
+        worker = self._idle.get()
+        started = time.monotonic()
+        try:
+            places = worker.run_query(
+                query, total, timeout=timeout,
+                on_place=(lambda place: on_place(query, place)) if on_place else None
+            )
+            return QueryResult(query, places, None, time.monotonic() - started, worker.last_stats)
+        except Exception as e:
+            return QueryResult(query, None, e, time.monotonic() - started, worker.last_stats)
+        finally:
+            if self.pause_between_queries:
+                time.sleep(self.pause_between_queries)
+            self._idle.put(worker)
+
+    def run_queries(self, queries, total, timeout=120, on_place=None, controller=None):
+        """
+        Runs `queries` concurrently and yields a QueryResult for each, in
+        completion order. If given, `on_place(query, place)` is called from the
+        pool's threads as each place is streamed back, so it must be thread-safe.
+
+        `queries` is consumed lazily, one query each time a slot frees up, so
+        it may be an iterator that grows as results are yielded (QueryPlanner).
+
+        With a ConcurrencyController, at most `controller.limit` queries (and
+        never more than the pool size) run at once. Every outcome is reported
+        to the controller; when it shrinks the limit the idle browsers above
+        it are stopped, and when it asks for a recycle all idle browsers are
+        restarted.
+        """
+        remaining = iter(queries)
+        in_flight = set()
+
+        def limit():
+            return min(self.size, controller.limit) if controller else self.size
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            while True:
+                while len(in_flight) < limit():
+                    query = next(remaining, None)
+                    if query is None:
+                        break
+                    in_flight.add(executor.submit(self._run_on_idle_worker, query, total, timeout, on_place))
+                if not in_flight:
+                    return
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if controller:
+                        controller.record(result.error is None)
+                        action = controller.adjust()
+                        if action == SHRINK:
+                            self._stop_idle_workers(keep=controller.limit)
+                        elif action == RECYCLE:
+                            self._stop_idle_workers(keep=0)
+                    yield result
+
+    def _stop_idle_workers(self, keep):
+        """
+        Stops idle workers until at most `keep` browsers are running. Stopped
+        workers stay in the pool and start a fresh browser on their next query.
+        """
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        running = sum(1 for worker in self._workers if worker.is_alive())
+        for worker in idle:
+            if running <= keep:
+                break
+            if worker.is_alive():
+                worker.close()
+                running -= 1
+        for worker in idle:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+
+def append_places_to_csv(places, output_path):
+    """
+    Appends place dicts to a CSV file. If the file already exists its header
+    is kept so that every appended block has the same columns.
+    """
+    if not places:
+        return
+    fieldnames = list(places[0].keys())
+    file_exists = os.path.isfile(output_path) and os.path.getsize(output_path) > 0
+    if file_exists:
+        with open(output_path, newline='', encoding='utf-8') as f:
+            fieldnames = next(csv.reader(f), fieldnames)
+    with open(output_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(places)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import namedtuple
+
+from src.scrapers.email_extractor import ContactLink, PageExtraction
+
+# Página guardada: validadores HTTP, hash del HTML y el resultado de la
+# extracción, para no repetirla mientras el contenido no cambie.
+CachedPage = namedtuple('CachedPage', ['url', 'final_url', 'etag', 'last_modified', 'content_hash',
+                                       'extraction', 'js_only', 'fetched_at'])
+
+DAY_S = 24 * 60 * 60
+
+
+def content_hash(html):
+    return hashlib.sha256(html.encode('utf-8', errors='replace')).hexdigest()
+
+
+class PageCache:
+    """
+    Caché en disco (SQLite) de las páginas rastreadas por el scraper de
+    correos, por URL. Guarda los validadores (ETag, Last-Modified) para
+    hacer peticiones condicionales al volver a rastrear, y el hash del
+    contenido junto con su extracción para no repetirla si la página no
+    cambió. Las entradas con más de `ttl_days` días se ignoran y se eliminan.
+    """
+
+    def __init__(self, db_path, ttl_days=180, batch_size=100):
+        self.ttl_s = ttl_days * DAY_S
+        self.batch_size = batch_size
+        self.hits = 0
+        self._pending = []
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS paginas (
+            url TEXT PRIMARY KEY,
+            url_final TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            hash_contenido TEXT NOT NULL,
+            correos TEXT NOT NULL,
+            enlaces_contacto TEXT NOT NULL,
+            solo_js INTEGER NOT NULL,
+            fecha_descarga REAL NOT NULL
+        )
+        """)
+        self._conn.commit()
+
+    def get(self, url):
+        """Devuelve la CachedPage de una URL, o None si no está o ya venció."""
+        row = self._conn.execute(
+            "SELECT url, url_final, etag, last_modified, hash_contenido, correos, enlaces_contacto, solo_js, fecha_descarga "
+            "FROM paginas WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None or time.time() - row[8] > self.ttl_s:
+            return None
+        extraction = PageExtraction(set(json.loads(row[5])), [ContactLink(*link) for link in json.loads(row[6])])
+        return CachedPage(row[0], row[1], row[2], row[3], row[4], extraction, bool(row[7]), row[8])
+
+    def put(self, url, final_url, etag, last_modified, hash_value, extraction, js_only):
+        """Guarda (o renueva) una página; se escribe en disco por lotes."""
+        self._pending.append((
+            url, final_url, etag, last_modified, hash_value,
+            json.dumps(sorted(extraction.emails)), json.dumps([list(link) for link in extraction.contact_links]),
+            int(js_only), time.time(),
+        ))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def touch(self, cached):
+        """Renueva la fecha de una página que el servidor confirmó sin cambios."""
+        self.hits += 1
+        self.put(cached.url, cached.final_url, cached.etag, cached.last_modified, cached.content_hash,
+                 cached.extraction, cached.js_only)
+
+    def flush(self):
+        if self._pending:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+            self._pending = []
+
+    def evict_expired(self):
+        """Elimina las entradas vencidas y devuelve cuántas eran."""
+        with self._conn:
+            cursor = self._conn.execute("DELETE FROM paginas WHERE fecha_descarga < ?", (time.time() - self.ttl_s,))
+        return cursor.rowcount
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
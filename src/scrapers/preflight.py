@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import socket
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados de scraping asignados a los dominios que no pasan la verificación previa
+ESTADO_DOMINIO_INEXISTENTE = 'dominio_inexistente'  # El dominio no resuelve (NXDOMAIN o sin direcciones)
+ESTADO_SIN_CONEXION = 'sin_conexion'  # Resuelve, pero no acepta conexiones en 443 ni 80 (o en el puerto de la URL)
+
+# Resultado de la verificación de un host. `status` es None si el host está
+# disponible (o si no se pudo determinar) y debe rastrearse.
+PreflightResult = namedtuple('PreflightResult', ['host', 'status', 'detail'])
+
+# Errores de getaddrinfo que indican que el dominio realmente no existe. Los
+# demás (p. ej. EAI_AGAIN, un fallo temporal del DNS) no descartan el sitio.
+_NONEXISTENT_ERRORS = {
+    getattr(socket, name) for name in ('EAI_NONAME', 'EAI_NODATA', 'EAI_FAIL') if hasattr(socket, name)
+}
+
+
+class DomainPreflight:
+    """
+    Verifica en paralelo que los hosts pendientes resuelvan por DNS y acepten
+    una conexión TCP, con timeouts cortos, antes de programar trabajo de
+    rastreo. Se verifica el host exacto que se va a rastrear (con su 'www.' o
+    subdominio), y si la URL indica un puerto, solo ese puerto en vez de
+    `ports`. Los resultados se guardan por (host, puerto) durante la ejecución.
+
+    Las consultas DNS corren en un pool de hilos propio, con tantos hilos como
+    `concurrency`, y no en el executor por defecto del bucle (que tiene pocos
+    hilos): así el timeout de DNS mide la consulta y no la espera en cola. Una
+    consulta que excede el timeout ocupa su hilo hasta terminar.
+    """
+
+    def __init__(self, dns_timeout=3.0, connect_timeout=3.0, concurrency=100, ports=(443, 80),
+                 canary_domain='www.google.com'):
+        self.dns_timeout = dns_timeout
+        self.canary_domain = canary_domain
+        self.connect_timeout = connect_timeout
+        self.ports = ports
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._dns_slots = asyncio.Semaphore(concurrency)
+        self._resolver = None
+        self._cache = {}
+
+    async def check(self, host, port=None):
+        """Devuelve el PreflightResult de un host, usando la caché si ya se verificó."""
+        key = (host, port)
+        if key not in self._cache:
+            async with self._slots:
+                self._cache[key] = await self._check(host, port)
+        return self._cache[key]
+
+    async def check_all(self, targets):
+        """
+        Verifica todos los pares (host, puerto) a la vez, con puerto None para
+        los de `ports`, y devuelve un dict {(host, puerto): PreflightResult}.
+
+        Si ni siquiera el dominio de control es accesible, el problema es la red
+        local y no los sitios: no se emite ningún veredicto (dict vacío).
+        """
+        if self.canary_domain:
+            canary = await self._check(self.canary_domain)
+            if canary.status is not None:
+                logging.error(f"Verificación previa omitida: no hay conexión con {self.canary_domain} ({canary.detail}).")
+                return {}
+        targets = list(targets)
+        try:
+            results = await asyncio.gather(*(self.check(host, port) for host, port in targets))
+        finally:
+            self.close()
+        return dict(zip(targets, results))
+
+    def close(self):
+        """Libera el pool de hilos de DNS sin esperar las consultas colgadas; se recrea si hace falta."""
+        if self._resolver is not None:
+            self._resolver.shutdown(wait=False)
+            self._resolver = None
+
+    async def _resolve(self, host):
+        """getaddrinfo de `host` en el pool propio, con `dns_timeout` desde que empieza la consulta."""
+        if self._resolver is None:
+            self._resolver = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='preflight-dns')
+        # Un cupo por hilo: cada consulta empieza de inmediato y lo libera al terminar, aunque ya se haya
+        # dado por vencida
+        await self._dns_slots.acquire()
+        lookup = asyncio.get_running_loop().run_in_executor(
+            self._resolver, socket.getaddrinfo, host, None, 0, socket.SOCK_STREAM
+        )
+
+        def release(future):
+            self._dns_slots.release()
+            if not future.cancelled():
+                future.exception()  # Evita el aviso de excepción no consultada tras un timeout
+
+        lookup.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.shield(lookup), timeout=self.dns_timeout)
+
+    async def _check(self, host, port=None):
+        try:
+            addresses = await self._resolve(host)
+        except socket.gaierror as e:
+            if e.errno in _NONEXISTENT_ERRORS:
+                return PreflightResult(host, ESTADO_DOMINIO_INEXISTENTE, str(e))
+            return PreflightResult(host, None, f"DNS no concluyente: {e}")
+        except asyncio.TimeoutError:
+            return PreflightResult(host, None, "DNS no concluyente: timeout")
+        if not addresses:
+            return PreflightResult(host, ESTADO_DOMINIO_INEXISTENTE, "sin direcciones")
+
+        # Se conecta a la dirección ya resuelta (IPv4 primero): open_connection con el nombre volvería a
+        # consultar el DNS, esta vez en el executor por defecto
+        address = sorted(addresses, key=lambda info: info[0] != socket.AF_INET)[0][4][0]
+        last_error = None
+        for port in ((port,) if port else self.ports):
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(address, port), timeout=self.connect_timeout
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                last_error = e
+                continue
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return PreflightResult(host, None, f"puerto {port}")
+        logging.debug(f"Sin conexión con {host}: {last_error!r}")
+        return PreflightResult(host, ESTADO_SIN_CONEXION, repr(last_error))
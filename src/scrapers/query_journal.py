@@ -0,0 +1,169 @@
+import sqlite3
+from collections import namedtuple
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+# Last known state of one query. `status` and `attempts` refer to the current
+# sweep; `result_count` is the number of new places it last extracted,
+# `found_count` the number of listings its feed showed and `pruned_sweeps` the
+# number of earlier sweeps in a row the planner skipped it.
+JournalEntry = namedtuple('JournalEntry', ['status', 'attempts', 'result_count', 'found_count', 'pruned_sweeps'])
+
+
+class QueryJournal:
+    """
+    Durable per-query record of a Google Maps sweep, stored in SQLite.
+
+    Every finished query is committed immediately with its status, attempt
+    count, result count, duration and last error, so that a sweep interrupted
+    by a crash, reboot or Ctrl-C can be resumed without re-running the queries
+    that already completed. Rows are kept between sweeps, which preserves the
+    last known yield of each query.
+
+    Sweeps are numbered: a query's status and attempts only count for the
+    sweep they were recorded in, so a sweep only holds the queries registered
+    in it and an earlier sweep's results are never mistaken for this one's.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS query_journal (
+            query TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result_count INTEGER,
+            found_count INTEGER,
+            pruned_sweeps INTEGER NOT NULL DEFAULT 0,
+            pruned_in INTEGER,
+            sweep INTEGER NOT NULL DEFAULT 0,
+            duration_s REAL,
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        # Journals created before the listing count was recorded
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(query_journal)")]
+        if 'found_count' not in columns:
+            self.conn.execute("ALTER TABLE query_journal ADD COLUMN found_count INTEGER")
+        if 'pruned_sweeps' not in columns:
+            self.conn.execute("ALTER TABLE query_journal ADD COLUMN pruned_sweeps INTEGER NOT NULL DEFAULT 0")
+        if 'sweep' not in columns:
+            self.conn.execute("ALTER TABLE query_journal ADD COLUMN pruned_in INTEGER")
+            self.conn.execute("ALTER TABLE query_journal ADD COLUMN sweep INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+        self.sweep = self.conn.execute("SELECT COALESCE(MAX(sweep), 0) FROM query_journal").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start_sweep(self, queries=(), resume=False):
+        """
+        Starts a new sweep, or continues the last one with `resume`, and
+        registers `queries` in it. Planned sweeps register their queries with
+        `add_queries()` as the planner queues them instead.
+        """
+        if not resume:
+            self.sweep += 1
+        self.add_queries(queries)
+
+    def add_queries(self, queries):
+        """
+        Registers `queries` as pending in the current sweep. Queries already
+        in it keep their status and attempts.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO query_journal (query, sweep) VALUES (?, ?)",
+                [(q, self.sweep) for q in queries]
+            )
+            self.conn.executemany(
+                "UPDATE query_journal SET status = ?, attempts = 0, error = NULL, sweep = ?, "
+                "updated_at = CURRENT_TIMESTAMP WHERE query = ? AND sweep != ?",
+                [(PENDING, self.sweep, q, self.sweep) for q in queries]
+            )
+
+    def pending_queries(self, queries, max_attempts):
+        """Returns the queries, in the given order, that are not done and still have attempts left."""
+        history = self.history()
+        pending = []
+        for query in queries:
+            entry = history.get(query)
+            if entry is None or (entry.status != DONE and entry.attempts < max_attempts):
+                pending.append(query)
+        return pending
+
+    def history(self):
+        """
+        Returns {query: JournalEntry} for every query ever registered. Queries
+        not registered in the current sweep read as pending with no attempts.
+        """
+        rows = self.conn.execute(
+            "SELECT query, status, attempts, result_count, found_count, pruned_sweeps, pruned_in, sweep "
+            "FROM query_journal"
+        ).fetchall()
+        history = {}
+        for query, status, attempts, result_count, found_count, pruned_sweeps, pruned_in, sweep in rows:
+            if sweep != self.sweep:
+                status, attempts = PENDING, 0
+            if pruned_in == self.sweep:
+                pruned_sweeps -= 1  # Already counted for this sweep by an earlier run of it
+            history[query] = JournalEntry(status, attempts, result_count, found_count, pruned_sweeps)
+        return history
+
+    def mark_done(self, query, result_count, duration_s, found_count=None):
+        self._record(query, DONE, result_count, duration_s, None, found_count)
+
+    def mark_failed(self, query, error, duration_s, found_count=None):
+        self._record(query, FAILED, None, duration_s, str(error), found_count)
+
+    def mark_pruned(self, queries):
+        """
+        Counts the current sweep as one more in which the planner skipped each
+        of `queries`. A sweep is counted once, however many times it is resumed.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE query_journal SET pruned_sweeps = pruned_sweeps + 1, pruned_in = ? "
+                "WHERE query = ? AND pruned_in IS NOT ?",
+                [(self.sweep, q, self.sweep) for q in queries]
+            )
+
+    def _record(self, query, status, result_count, duration_s, error, found_count=None):
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO query_journal (query, status, attempts, result_count, found_count, duration_s, error, sweep,
+                                           updated_at)
+                VALUES (?, ?, 1, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(query) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = CASE WHEN query_journal.sweep = excluded.sweep THEN query_journal.attempts + 1 ELSE 1 END,
+                    result_count = COALESCE(excluded.result_count, query_journal.result_count),
+                    found_count = COALESCE(excluded.found_count, query_journal.found_count),
+                    pruned_sweeps = 0,
+                    pruned_in = NULL,
+                    duration_s = excluded.duration_s,
+                    error = excluded.error,
+                    sweep = excluded.sweep,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (query, status, result_count, found_count, duration_s, error, self.sweep))
+
+    def summary(self, queries=None):
+        """Returns a {status: count} dict for the given queries, by default those of the current sweep."""
+        counts = {}
+        rows = self.conn.execute("SELECT query, status FROM query_journal WHERE sweep = ?", (self.sweep,)).fetchall()
+        wanted = None if queries is None else set(queries)
+        for query, status in rows:
+            if wanted is None or query in wanted:
+                counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def close(self):
+        self.conn.close()
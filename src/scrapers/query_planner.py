@@ -0,0 +1,138 @@
+import heapq
+from itertools import count
+
+from src.scrapers.query_journal import DONE
+
+
+def format_query(category, location):
+    # Format: "categoría en ubicación, Chile"
+    return f'"{category}" en {location}, Chile'
+
+
+def root_locations(location_tree):
+    """The broad locations of the tree: those that are not a sub-location of another."""
+    children = {child for sub_locations in location_tree.values() for child in (sub_locations or [])}
+    return [location for location in location_tree if location not in children]
+
+
+def iter_locations(location_tree):
+    """Yields every location of the tree once, broad locations before their sub-locations."""
+    seen = set()
+    pending = root_locations(location_tree)
+    while pending:
+        location = pending.pop(0)
+        if location in seen:
+            continue
+        seen.add(location)
+        yield location
+        pending.extend(location_tree.get(location) or [])
+
+
+class QueryPlanner:
+    """
+    Adaptive plan of Google Maps queries over a category x location tree.
+
+    Only the broad locations (see `root_locations`) are queued at
+    first. A query whose feed shows at least `saturation_count` listings hit
+    Google Maps' result cap and may be hiding places, so `record()` queues
+    the same category in each of its sub-locations; unsaturated queries are
+    not expanded. Sub-location queries whose feed last showed fewer than
+    `min_yield` listings are pruned, and listed in `pruned` so the journal
+    can count it; after `recheck_after` pruned sweeps in a row such a query
+    is run again, in case the area gained places. Pruning looks at the
+    listings shown rather than at the new places extracted, which drop to
+    zero on any repeat sweep while the seen-place store still holds them.
+    Queued queries run broadest first, then those never run before, then by
+    their last yield of new places.
+
+    The planner is an iterator that grows while it is consumed, so it can be
+    passed directly to MapsWorkerPool.run_queries as long as every result is
+    reported with `record()` before the next query is requested.
+
+    With `resume`, queries the journal `history` marks as done are not run
+    again but are expanded from their recorded listing count, and queries
+    that failed `max_attempts` times are skipped, though still expanded if
+    their feed was saturated. `on_queue`, if given, is
+    called with each query as it is queued, e.g. to register it in the journal.
+    """
+
+    def __init__(self, categories, location_tree, saturation_count, history=None,
+                 resume=False, max_attempts=3, min_yield=1, recheck_after=5, on_queue=None):
+        self.categories = list(categories)
+        self.location_tree = location_tree
+        self.saturation_count = saturation_count
+        self.history = history or {}
+        self.resume = resume
+        self.max_attempts = max_attempts
+        self.min_yield = min_yield
+        self.recheck_after = recheck_after
+        self.on_queue = on_queue
+        self.pruned = []
+        self.stats = {'queued': 0, 'expanded': 0, 'pruned': 0, 'resumed': 0}
+        self._heap = []
+        self._order = count()
+        self._offered = {}  # query -> (category, location, depth)
+        for category in self.categories:
+            for location in root_locations(location_tree):
+                self._offer(category, location, 0)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._heap:
+            raise StopIteration
+        return heapq.heappop(self._heap)[-1]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def all_queries(self):
+        """Every query of the full grid, the upper bound of what the plan may run."""
+        return [format_query(category, location)
+                for category in self.categories for location in iter_locations(self.location_tree)]
+
+    def _offer(self, category, location, depth):
+        query = format_query(category, location)
+        if query in self._offered:
+            return
+        self._offered[query] = (category, location, depth)
+        entry = self.history.get(query)
+
+        if self.resume and entry is not None:
+            if entry.status == DONE:
+                self.stats['resumed'] += 1
+                self.record(query, entry.found_count)
+                return
+            if entry.attempts >= self.max_attempts:
+                # Out of attempts, but a feed it saw saturated is still split
+                self.record(query, entry.found_count)
+                return
+        if (depth > 0 and entry is not None and entry.found_count is not None
+                and entry.found_count < self.min_yield and entry.pruned_sweeps < self.recheck_after):
+            self.stats['pruned'] += 1
+            self.pruned.append(query)
+            return
+        last_yield = entry.result_count if entry is not None else None
+
+        priority = (depth, last_yield is not None, -(last_yield or 0), next(self._order))
+        heapq.heappush(self._heap, priority + (query,))
+        self.stats['queued'] += 1
+        if self.on_queue:
+            self.on_queue(query)
+
+    def record(self, query, found_count):
+        """
+        Reports how many listings a query's feed showed, even if extracting
+        its places then failed. A saturated query is expanded into its
+        sub-locations; returns how many were queued.
+        """
+        if query not in self._offered or found_count is None or found_count < self.saturation_count:
+            return 0
+        category, location, depth = self._offered[query]
+        queued = self.stats['queued']
+        for sub_location in self.location_tree.get(location) or []:
+            self._offer(category, sub_location, depth + 1)
+        if self.stats['queued'] > queued:
+            self.stats['expanded'] += 1
+        return self.stats['queued'] - queued
@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import psutil
+
+# Actions returned by ConcurrencyController.adjust()
+GROW = 'grow'
+SHRINK = 'shrink'
+RECYCLE = 'recycle'
+HOLD = 'hold'
+
+MB = 1024 * 1024
+
+# One measurement of the machine and of the scraper's process tree.
+ResourceSample = namedtuple('ResourceSample', ['tree_rss_mb', 'available_mb', 'cpu_percent', 'error_rate'])
+
+
+def process_tree_rss_mb(pid=None):
+    """
+    Returns the memory, in MB, used by a process and all its descendants.
+    For the scrapers this includes the Playwright drivers, the worker
+    processes and every Chromium browser and renderer they started.
+
+    Each process counts its unique set size (USS), the memory freed if it
+    exited. Summing RSS would count the pages Chromium processes share
+    (code, shared memory) once per process, which overstates the tree
+    several times over with many renderers. Where USS is not available
+    (no permission, unsupported platform) RSS is used, which overcounts.
+    """
+    try:
+        root = psutil.Process(pid or os.getpid())
+        processes = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0.0
+    total = 0
+    for process in processes:
+        try:
+            try:
+                memory = process.memory_full_info()
+            except psutil.AccessDenied:
+                memory = process.memory_info()
+            total += getattr(memory, 'uss', memory.rss)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total / MB
+
+
+class ConcurrencyController:
+    """
+    Adapts the number of tasks in flight to the machine's real capacity.
+
+    Callers report each task outcome with `record()` and call `adjust()`
+    regularly. The limit grows by one while memory, CPU and the recent
+    error/timeout rate are healthy, and is halved as soon as one of them
+    crosses its threshold. When memory is still too high at the minimum
+    limit, `adjust()` returns RECYCLE so that the caller restarts its
+    browsers, which gives back the memory Chromium tends to accumulate.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial=None, memory_limit_mb=None,
+                 min_available_mb=512, cpu_limit_percent=85.0, error_rate_limit=0.3,
+                 window=20, adjust_interval=10.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        initial = self.max_limit if initial is None else initial
+        self.limit = max(self.min_limit, min(initial, self.max_limit))
+        # By default the process tree may use up to 70% of the machine's RAM
+        self.memory_limit_mb = memory_limit_mb or psutil.virtual_memory().total * 0.7 / MB
+        self.min_available_mb = min_available_mb
+        self.cpu_limit_percent = cpu_limit_percent
+        self.error_rate_limit = error_rate_limit
+        self.adjust_interval = adjust_interval
+        self.last_sample = None
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._last_adjust = time.monotonic()
+        psutil.cpu_percent(interval=None)  # Primes the counter; the first reading is meaningless
+
+    def record(self, ok):
+        """Records the outcome of one task (False for an error or a timeout)."""
+        with self._lock:
+            self._outcomes.append(bool(ok))
+
+    def error_rate(self):
+        """Share of failed tasks in the recent window, 0 until there is enough evidence."""
+        with self._lock:
+            outcomes = list(self._outcomes)
+        if len(outcomes) < min(5, self._outcomes.maxlen):
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def sample(self):
+        return ResourceSample(
+            tree_rss_mb=process_tree_rss_mb(),
+            available_mb=psutil.virtual_memory().available / MB,
+            cpu_percent=psutil.cpu_percent(interval=None),
+            error_rate=self.error_rate(),
+        )
+
+    def adjust(self, force=False):
+        """
+        Re-evaluates the limit, at most once every `adjust_interval` seconds
+        unless `force` is set, and returns the action taken.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_adjust < self.adjust_interval:
+                return HOLD
+            self._last_adjust = now
+
+        sample = self.sample()
+        self.last_sample = sample
+        memory_pressure = (sample.tree_rss_mb > self.memory_limit_mb
+                           or sample.available_mb < self.min_available_mb)
+        overloaded = (memory_pressure
+                      or sample.cpu_percent > self.cpu_limit_percent
+                      or sample.error_rate > self.error_rate_limit)
+        healthy = (sample.cpu_percent < self.cpu_limit_percent * 0.75
+                   and sample.available_mb > self.min_available_mb * 2)
+
+        with self._lock:
+            previous = self.limit
+            action = HOLD
+            if overloaded:
+                if memory_pressure and previous == self.min_limit:
+                    action = RECYCLE
+                elif previous > self.min_limit:
+                    self.limit = max(self.min_limit, previous // 2)
+                    action = SHRINK
+                # Judge the new limit on its own outcomes
+                self._outcomes.clear()
+            elif healthy and previous < self.max_limit:
+                self.limit = previous + 1
+                action = GROW
+
+        if action != HOLD:
+            logging.info(
+                f"Concurrency {action}: {previous} -> {self.limit} (process tree {sample.tree_rss_mb:.0f} MB, "
+                f"available {sample.available_mb:.0f} MB, CPU {sample.cpu_percent:.0f}%, "
+                f"errors {sample.error_rate:.0%})"
+            )
+        return action
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+# Fixed schema of a scraped place. Every record has exactly these keys, in
+# this order, whatever the scraper returned for it.
+RESULT_FIELDS = [
+    'query',
+    'place_id',
+    'name',
+    'address',
+    'website',
+    'phone_number',
+    'reviews_count',
+    'reviews_average',
+    'store_shopping',
+    'in_store_pickup',
+    'store_delivery',
+    'place_type',
+    'opens_at',
+    'introduction',
+    'scraped_at',
+]
+
+
+# Column types that are not strings in the Parquet output.
+NUMERIC_FIELDS = {'reviews_count': 'int64', 'reviews_average': 'float64'}
+
+# A sink is due for a flush after this many records or seconds since the last one.
+FLUSH_ROWS = 1000
+FLUSH_INTERVAL_S = 60
+
+
+def make_record(query, place):
+    """Builds a fixed-schema record from a place dict returned by the scraper."""
+    record = {field: place.get(field) for field in RESULT_FIELDS}
+    record['query'] = query
+    record['scraped_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return record
+
+
+class _Sink:
+    """
+    Counts the records written since the last flush. Callers flush when
+    `flush_due()` says so, after `flush_rows` records or `flush_interval_s`
+    seconds, rather than after every query.
+    """
+
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_interval_s=FLUSH_INTERVAL_S):
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.records_written = 0
+        self._lock = threading.Lock()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def flush_due(self):
+        with self._lock:
+            return (self._unflushed >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval_s)
+
+    def _count_write(self):
+        self.records_written += 1
+        self._unflushed += 1
+
+    def _count_flush(self):
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+
+class JsonlSink(_Sink):
+    """
+    Appends one JSON object per place to a JSON lines file as soon as it is
+    extracted. Each record is written with a single write() on a file opened
+    with O_APPEND, so concurrent writers never interleave and a crash can at
+    most leave one incomplete last line (readers skip it). `flush()` fsyncs
+    the file.
+    """
+
+    def __init__(self, path, flush_rows=FLUSH_ROWS, flush_interval_s=FLUSH_INTERVAL_S):
+        super().__init__(flush_rows, flush_interval_s)
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, query, place):
+        line = json.dumps(make_record(query, place), ensure_ascii=False) + '\n'
+        with self._lock:
+            os.write(self._fd, line.encode('utf-8'))
+            self._count_write()
+
+    def flush(self):
+        with self._lock:
+            os.fsync(self._fd)
+            self._count_flush()
+
+    def close(self):
+        self.flush()
+        os.close(self._fd)
+
+
+class ParquetSink(_Sink):
+    """
+    Writes places to a Parquet dataset partitioned by run:
+    `<base_dir>/run=<run_id>/part-00000.parquet`, ... Records are buffered up
+    to `rows_per_file` and each part is written to a temporary file and renamed
+    into place, so readers never see a partial file. Buffered records are
+    only on disk after `flush()`; flushing when `flush_due()` keeps parts
+    from shrinking to one query's worth of rows.
+    """
+
+    def __init__(self, base_dir, run_id=None, rows_per_file=FLUSH_ROWS, flush_interval_s=FLUSH_INTERVAL_S):
+        if pa is None:
+            raise RuntimeError("Parquet output requires the 'pyarrow' package (pip install pyarrow).")
+        super().__init__(rows_per_file, flush_interval_s)
+        self.run_id = run_id or time.strftime('%Y%m%dT%H%M%S')
+        self.run_dir = os.path.join(base_dir, f'run={self.run_id}')
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.rows_per_file = rows_per_file
+        self._buffer = []
+        self._parts = 0
+
+    def write(self, query, place):
+        with self._lock:
+            self._buffer.append(make_record(query, place))
+            self._count_write()
+            if len(self._buffer) >= self.rows_per_file:
+                self._write_part()
+
+    def flush(self):
+        with self._lock:
+            self._write_part()
+            self._count_flush()
+
+    def _write_part(self):
+        if not self._buffer:
+            return
+        columns = {field: [record[field] for record in self._buffer] for field in RESULT_FIELDS}
+        table = pa.table(columns, schema=self._schema())
+        final_path = os.path.join(self.run_dir, f'part-{self._parts:05d}.parquet')
+        tmp_path = final_path + '.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, final_path)
+        logging.info(f"Wrote {len(self._buffer)} places to {final_path}")
+        self._parts += 1
+        self._buffer = []
+
+    @staticmethod
+    def _schema():
+        # Explicit so that every part has the same types, even when a column is all null.
+        return pa.schema([(field, pa.type_for_alias(NUMERIC_FIELDS.get(field, 'string'))) for field in RESULT_FIELDS])
+
+    def close(self):
+        self.flush()
+
+
+class SeenPlaceRecorder:
+    """
+    Marks places as extracted in the seen-places database the scraper
+    workers read to skip known listings (the vendor's SeenPlaceStore table).
+    Places are marked only once the sink has persisted them, so a crash
+    before a flush makes them be extracted again instead of lost.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_places ("
+            "place_id TEXT PRIMARY KEY, name TEXT, extracted_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def mark(self, places):
+        now = time.time()
+        rows = [(place['place_id'], place.get('name'), now) for place in places if place.get('place_id')]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO seen_places (place_id, name, extracted_at) VALUES (?, ?, ?)", rows
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def open_sink(output_format, jsonl_path, parquet_dir):
+    """Returns the result sink for `output_format` ('jsonl' or 'parquet')."""
+    if output_format == 'parquet':
+        return ParquetSink(parquet_dir)
+    return JsonlSink(jsonl_path)
@@ -1,9 +1,6 @@
-import subprocess
 import os
 import logging
 import sys
-import time
-import psutil
 import argparse
 
 # Configure logging
@@ -14,16 +11,38 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.append(PROJECT_ROOT)
 
 # Now we can import from src.config
-from src.config import ACTIVE_CATEGORIES, ACTIVE_LOCATIONS
+from src.config import ACTIVE_CATEGORIES, ACTIVE_LOCATIONS, LOCATION_TREE, SEARCH_BBOX
+from src.scrapers.browser_profile import DEFAULT_PROFILE, vendor_worker_args
+from src.scrapers.maps_worker import MapsWorkerPool, WorkerTimeout
+from src.scrapers.query_journal import QueryJournal
+from src.scrapers.query_planner import QueryPlanner, format_query
+from src.scrapers.resource_controller import ConcurrencyController
+from src.scrapers.result_sink import SeenPlaceRecorder, open_sink
+from src.scrapers.viewport_tiler import TilePlanner, count_in_tile
 
 # --- Configuration ---
-SCRAPER_VENDOR_DIR = os.path.join(PROJECT_ROOT, 'vendor', 'google-maps-scrapper')
+SCRAPER_VENDOR_DIR = os.path.join(PROJECT_ROOT, 'vendor', 'google-maps-scraper')
 VENV_PYTHON = os.path.join(SCRAPER_VENDOR_DIR, '.venv', 'bin', 'python')
 SCRAPER_MAIN_SCRIPT = os.path.join(SCRAPER_VENDOR_DIR, 'main.py')
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'raw', 'google_maps')
+RESULTS_JSONL_PATH = os.path.join(OUTPUT_DIR, 'google_maps_results.jsonl')
+RESULTS_PARQUET_DIR = os.path.join(OUTPUT_DIR, 'parquet')
+DEFAULT_OUTPUT_FORMAT = 'jsonl'  # 'jsonl' (appended file) or 'parquet' (one partition per run)
 TOTAL_RESULTS_PER_QUERY = 200  # Number of results to scrape per query
-MEMORY_THRESHOLD_MB = 2048  # Pause if memory exceeds 2GB
-PAUSE_ON_HIGH_MEMORY_S = 30  # Pause duration in seconds on high memory
+QUERY_TIMEOUT_S = 120  # Time budget per query, browser startup excluded
+DEFAULT_WORKERS = 1  # Maximum number of queries (browsers) running at once
+DEFAULT_DETAIL_MODE = 'click'  # 'click' each listing, open place URLs in parallel 'tabs', or parse the 'network' responses
+DEFAULT_DETAIL_TABS = 4  # Tabs per worker when DEFAULT_DETAIL_MODE is 'tabs'
+SEEN_PLACES_DB = os.path.join(OUTPUT_DIR, 'seen_places.db')  # Places already extracted, shared across queries and runs
+SEEN_PLACES_TTL_DAYS = 90  # Re-extract a known place after this many days
+QUERY_JOURNAL_DB = os.path.join(OUTPUT_DIR, 'query_journal.db')  # Per-query status, used by --resume
+MAX_QUERY_ATTEMPTS = 3  # Failed queries are retried on resume until this many attempts
+MAX_MEMORY_MB = None  # Memory budget of the whole process tree (workers + browsers); None = 70% of RAM
+MAPS_FEED_LIMIT = 120  # Google Maps ends the results feed at about this many listings
+SATURATION_RESULTS = int(min(TOTAL_RESULTS_PER_QUERY, MAPS_FEED_LIMIT) * 0.9)  # A query finding this many listings is split into sub-locations
+MIN_QUERY_YIELD = 1  # Sub-location queries whose feed last showed fewer listings are pruned
+PRUNED_RECHECK_SWEEPS = 5  # ...and run again after being pruned this many sweeps in a row
+MAX_TILE_DEPTH = 4  # With --tiles, a saturated tile is split into quadrants at most this many times
 
 def generate_search_queries():
     """
@@ -33,25 +52,43 @@ def generate_search_queries():
     # Using the active category and location lists from config.py
     for category in ACTIVE_CATEGORIES:
         for location in ACTIVE_LOCATIONS:
-            # Format: "categoría en ubicación, Chile"
-            queries.append(f'"{category}" en {location}, Chile')
+            queries.append(format_query(category, location))
     
     logging.info(f"Generated {len(queries)} search queries based on the active strategic configuration.")
     return queries
 
-def get_memory_usage():
-    """Returns the current memory usage of the process in MB."""
-    process = psutil.Process(os.getpid())
-    return process.memory_info().rss / (1024 * 1024) # in MB
-
-def run_google_maps_scraper(queries, chunk_size=50, pause_between_chunks=10):
+def run_google_maps_scraper(queries=None, workers=DEFAULT_WORKERS,
+                            detail_mode=DEFAULT_DETAIL_MODE, detail_tabs=DEFAULT_DETAIL_TABS,
+                            dedupe=True, seen_ttl_days=SEEN_PLACES_TTL_DAYS, resume=False,
+                            output_format=DEFAULT_OUTPUT_FORMAT, max_memory_mb=MAX_MEMORY_MB,
+                            tiles=False, base_url=None):
     """
-    Runs the Google Maps scraper in chunks to manage resources.
+    Runs the Google Maps scraper. The number of queries in flight is adapted
+    to the machine by a ConcurrencyController, which watches the memory of
+    the whole process tree, CPU load and the query error/timeout rate.
+
+    Without `queries`, a QueryPlanner walks ACTIVE_CATEGORIES x LOCATION_TREE:
+    broad locations first, sub-locations only for saturated queries, and
+    sub-location queries ordered by their last yield of new places and pruned
+    when their feed last showed no listings (re-checked every few sweeps).
+    With `tiles`, a TilePlanner searches each category over the SEARCH_BBOX
+    map viewport instead, splitting saturated tiles into quadrants.
 
     Args:
-        queries (list): A list of search strings.
-        chunk_size (int): The number of queries to process in each batch.
-        pause_between_chunks (int): The number of seconds to pause between chunks.
+        queries (list): A list of search strings, run as given. None to plan them.
+        workers (int): The maximum number of queries to run concurrently, each in its own browser.
+        detail_mode (str): 'click' each listing, open the place URLs in parallel 'tabs', or parse
+            the search responses the page downloads ('network'), clicking only incomplete listings.
+        detail_tabs (int): The number of tabs per worker in 'tabs' mode.
+        dedupe (bool): Skip places already extracted by a previous query or run.
+        seen_ttl_days (float): Age in days after which an already extracted place is refreshed.
+        resume (bool): Continue the previous sweep: skip queries the journal marks as done
+            and retry failed ones up to MAX_QUERY_ATTEMPTS.
+        output_format (str): 'jsonl' to append to RESULTS_JSONL_PATH, or 'parquet' to write
+            a new partition under RESULTS_PARQUET_DIR.
+        max_memory_mb (float): Memory budget of the scraper and all its browsers, in MB.
+        tiles (bool): Plan viewport tile searches over SEARCH_BBOX instead of location queries.
+        base_url (str): Origin the workers load Maps from instead of Google, e.g. a local stand-in page.
     """
     if not os.path.exists(VENV_PYTHON):
         logging.error(f"Scraper virtual environment not found at {VENV_PYTHON}")
@@ -60,65 +97,116 @@ def run_google_maps_scraper(queries, chunk_size=50, pause_between_chunks=10):
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     logging.info(f"Output will be saved to: {OUTPUT_DIR}")
-    output_csv_path = os.path.join(OUTPUT_DIR, 'google_maps_results.csv')
-
-    total_queries = len(queries)
-    num_chunks = (total_queries + chunk_size - 1) // chunk_size
-
-    for i in range(num_chunks):
-        start_index = i * chunk_size
-        end_index = start_index + chunk_size
-        chunk = queries[start_index:end_index]
-
-        logging.info(f"--- Processing Chunk {i + 1}/{num_chunks} ({len(chunk)} queries) ---")
-        logging.info(f"Initial memory usage: {get_memory_usage():.2f} MB")
-
-        for j, query in enumerate(chunk):
-            query_num = start_index + j + 1
-            logging.info(f"--- Running query {query_num}/{total_queries}: {query} ---")
-
-            command = [
-                VENV_PYTHON, SCRAPER_MAIN_SCRIPT, '--search', query,
-                '--total', str(TOTAL_RESULTS_PER_QUERY), '--output', output_csv_path, '--append'
-            ]
-
-            try:
-                # Run the scraper with a timeout and without check=True to handle errors manually
-                process = subprocess.run(
-                    command, capture_output=True, text=True, cwd=SCRAPER_VENDOR_DIR, timeout=120
-                )
-
-                if process.returncode == 0:
-                    logging.info(f"Successfully completed query: {query}")
-                    if process.stderr:
-                        # Log warnings from the scraper even on success
-                        logging.warning(f"Scraper STDERR:\n{process.stderr}")
+
+    journal = QueryJournal(QUERY_JOURNAL_DB)
+    planner = None
+    if tiles or queries is None:
+        # Only the queries the planner actually queues are registered in the sweep's journal
+        journal.start_sweep(resume=resume)
+    if tiles:
+        planner = TilePlanner(ACTIVE_CATEGORIES, SEARCH_BBOX, SATURATION_RESULTS, max_depth=MAX_TILE_DEPTH,
+                              history=journal.history(), resume=resume, max_attempts=MAX_QUERY_ATTEMPTS,
+                              on_queue=lambda query: journal.add_queries([query]))
+        queries = planner
+        logging.info(f"Planned {len(planner)} tile searches over {SEARCH_BBOX} "
+                     f"(tiles are split when a search finds {SATURATION_RESULTS}+ listings inside the tile, up to {MAX_TILE_DEPTH} times).")
+    elif queries is None:
+        planner = QueryPlanner(ACTIVE_CATEGORIES, LOCATION_TREE, SATURATION_RESULTS, history=journal.history(),
+                               resume=resume, max_attempts=MAX_QUERY_ATTEMPTS, min_yield=MIN_QUERY_YIELD,
+                               recheck_after=PRUNED_RECHECK_SWEEPS, on_queue=lambda query: journal.add_queries([query]))
+        all_queries = planner.all_queries()
+        queries = planner
+        logging.info(f"Planned {len(planner)} broad queries out of a grid of {len(all_queries)} "
+                     f"(sub-locations are searched only when a query finds {SATURATION_RESULTS}+ listings).")
+    else:
+        all_queries = queries
+        journal.start_sweep(all_queries, resume=resume)
+        if resume:
+            queries = journal.pending_queries(all_queries, MAX_QUERY_ATTEMPTS)
+            logging.info(f"Resuming sweep: {len(all_queries) - len(queries)} of {len(all_queries)} queries already done or out of attempts.")
+
+    total_queries = planner.stats['queued'] if planner is not None else len(queries)
+
+    # Long-lived workers keep their browsers open across all queries. Each place is
+    # written to the fixed-schema sink as soon as a worker streams it back.
+    sink = open_sink(output_format, RESULTS_JSONL_PATH, RESULTS_PARQUET_DIR)
+    # The workers only read the seen places; they are marked here once the sink has persisted them
+    seen_places = SeenPlaceRecorder(SEEN_PLACES_DB) if dedupe else None
+    unsaved = []  # Completed queries whose places are not yet known to be on disk
+
+    def save_completed():
+        """Flushes the sink, then marks the completed queries done and their places seen."""
+        try:
+            sink.flush()
+            for done in unsaved:
+                if seen_places:
+                    seen_places.mark(done.places)
+                journal.mark_done(done.query, len(done.places), done.duration, found_count=(done.stats or {}).get('found'))
+        except Exception as e:
+            for done in unsaved:
+                journal.mark_failed(done.query, e, done.duration)
+            logging.error(f"Could not save the results of {len(unsaved)} queries: {e}")
+        unsaved.clear()
+
+    controller = ConcurrencyController(max_limit=workers, initial=max(1, workers // 2), memory_limit_mb=max_memory_mb)
+    logging.info(f"Running up to {workers} queries concurrently (starting with {controller.limit}).")
+    queries_done = 0
+    # Every worker browser runs the shared lean profile: headless, no images,
+    # fonts, map tiles or trackers, and a fresh context every few queries.
+    worker_args = ['--detail-mode', detail_mode, '--tabs', str(detail_tabs)] + vendor_worker_args(DEFAULT_PROFILE)
+    if base_url:
+        worker_args += ['--base-url', base_url]
+    if dedupe:
+        worker_args += ['--seen-db', SEEN_PLACES_DB, '--seen-ttl-days', str(seen_ttl_days), '--seen-readonly']
+    with MapsWorkerPool(workers, VENV_PYTHON, SCRAPER_MAIN_SCRIPT, SCRAPER_VENDOR_DIR, worker_args) as pool:
+        results = pool.run_queries(queries, TOTAL_RESULTS_PER_QUERY, timeout=QUERY_TIMEOUT_S,
+                                   on_place=sink.write, controller=controller)
+        try:
+            for result in results:
+                queries_done += 1
+                query = result.query
+                # The worker reports the listings found before extracting them, so a saturated
+                # query is split even if extracting its places then failed or timed out
+                stats = result.stats or {}
+                found = stats.get('found')
+                if tiles and stats.get('positions') is not None:
+                    # The feed also lists places around the tile; only those inside it saturate it
+                    found = count_in_tile(query.tile, stats['positions'])
+                if planner is not None:
+                    added = planner.record(query, found)
+                    if added:
+                        split_into = 'quadrant tiles' if tiles else 'sub-location queries'
+                        logging.info(f"Query '{query}' is saturated ({found} listings): queued {added} {split_into}.")
+                    total_queries = planner.stats['queued']
+                if result.error is None:
+                    # Marked done (and its places seen) at the next flush of the sink
+                    unsaved.append(result)
+                    logging.info(f"Successfully completed query {queries_done}/{total_queries}: {query} ({len(result.places)} places)")
+                elif isinstance(result.error, WorkerTimeout):
+                    journal.mark_failed(query, result.error, result.duration, found_count=found)
+                    logging.error(f"Query '{query}' timed out after {QUERY_TIMEOUT_S} seconds. Restarting worker and moving on.")
                 else:
-                    # The scraper script failed (e.g., timeout, no results found)
-                    logging.error(f"Scraper failed for query: '{query}' with code {process.returncode}")
-                    logging.error(f"STDERR:\n{process.stderr}")
-
-            except subprocess.TimeoutExpired:
-                logging.error(f"Subprocess for query '{query}' timed out after 120 seconds. Moving on.")
-            except Exception as e:
-                # Catch any other unexpected errors in the wrapper script
-                logging.error(f"An unexpected wrapper error occurred for query '{query}': {e}")
-                # We do not break the loop, allowing the process to continue
-        
-        mem_usage = get_memory_usage()
-        logging.info(f"Finished Chunk {i + 1}/{num_chunks}. Memory usage: {mem_usage:.2f} MB")
-
-        if (i + 1) < num_chunks:
-            if mem_usage > MEMORY_THRESHOLD_MB:
-                logging.warning(f"Memory usage ({mem_usage:.2f} MB) exceeded threshold ({MEMORY_THRESHOLD_MB} MB). Pausing for {PAUSE_ON_HIGH_MEMORY_S} seconds.")
-                time.sleep(PAUSE_ON_HIGH_MEMORY_S)
-            else:
-                logging.info(f"Pausing for {pause_between_chunks} seconds before next chunk...")
-                time.sleep(pause_between_chunks)
-
-    logging.info("--- Google Maps scraping process finished. ---")
-    if os.path.exists(output_csv_path):
-        logging.info(f"All results saved to {output_csv_path}")
+                    # The scraper failed for this query (e.g., no results found, browser crash)
+                    journal.mark_failed(query, result.error, result.duration, found_count=found)
+                    logging.error(f"Scraper failed for query: '{query}': {result.error}")
+
+                if sink.flush_due():
+                    save_completed()
+        finally:
+            save_completed()
+
+    sink.close()
+    if seen_places:
+        seen_places.close()
+    logging.info(f"--- Google Maps scraping process finished. Journal: {journal.summary()} ---")
+    if tiles:
+        logging.info(f"Tile plan: {queries_done} tile searches run; {planner.stats}")
+    elif planner is not None:
+        logging.info(f"Query plan: {queries_done} of {len(all_queries)} grid queries run; {planner.stats}")
+        # Counted once per sweep, whether this run started it or resumed it
+        journal.mark_pruned(planner.pruned)
+    journal.close()
+    logging.info(f"{sink.records_written} places saved ({output_format}) under {OUTPUT_DIR}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Run the Google Maps Scraper with specific queries or from config.")
@@ -127,13 +215,85 @@ if __name__ == '__main__':
         nargs='+',
         help='A list of specific queries to run. Overrides the config file.'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Maximum number of queries to run concurrently, each in its own browser.'
+    )
+    parser.add_argument(
+        '--max-memory-mb',
+        type=float,
+        default=MAX_MEMORY_MB,
+        help="Memory budget of the scraper and all its browsers, in MB (default: 70%% of RAM)."
+    )
+    parser.add_argument(
+        '--detail-mode',
+        choices=['click', 'tabs', 'network'],
+        default=DEFAULT_DETAIL_MODE,
+        help="How place details are loaded: click each listing, open the place URLs in parallel tabs, "
+             "or parse them from the search responses the page already downloads."
+    )
+    parser.add_argument(
+        '--tabs',
+        type=int,
+        default=DEFAULT_DETAIL_TABS,
+        help="Number of parallel tabs per worker with --detail-mode tabs."
+    )
+    parser.add_argument(
+        '--no-dedupe',
+        action='store_true',
+        help="Extract every listing, even places already extracted by previous queries or runs."
+    )
+    parser.add_argument(
+        '--seen-ttl-days',
+        type=float,
+        default=SEEN_PLACES_TTL_DAYS,
+        help="Refresh already extracted places after this many days."
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Resume the previous sweep from the query journal, skipping completed queries and retrying failed ones."
+    )
+    parser.add_argument(
+        '--full-grid',
+        action='store_true',
+        help="Run every category x location query instead of planning them adaptively."
+    )
+    parser.add_argument(
+        '--tiles',
+        action='store_true',
+        help="Search each category over the SEARCH_BBOX map area, splitting saturated tiles, instead of by location names."
+    )
+    parser.add_argument(
+        '--base-url',
+        help="Load Maps from this origin instead of Google, e.g. a local stand-in page for testing."
+    )
+    parser.add_argument(
+        '--output-format',
+        choices=['jsonl', 'parquet'],
+        default=DEFAULT_OUTPUT_FORMAT,
+        help="Append results to a JSON lines file, or write a Parquet partition per run (requires pyarrow)."
+    )
     args = parser.parse_args()
 
     if args.queries:
         search_queries = args.queries
         logging.info(f"Running with {len(search_queries)} queries provided from command line.")
-    else:
-        logging.info("No specific queries provided, generating from config file.")
+    elif args.tiles:
+        logging.info("No specific queries provided, planning viewport tile searches from config file.")
+        search_queries = None
+    elif args.full_grid:
+        logging.info("No specific queries provided, generating the full grid from config file.")
         search_queries = generate_search_queries()
+    else:
+        logging.info("No specific queries provided, planning them adaptively from config file.")
+        search_queries = None
     
-    run_google_maps_scraper(search_queries)
+    run_google_maps_scraper(
+        search_queries, workers=args.workers, detail_mode=args.detail_mode, detail_tabs=args.tabs,
+        dedupe=not args.no_dedupe, seen_ttl_days=args.seen_ttl_days, resume=args.resume,
+        output_format=args.output_format, max_memory_mb=args.max_memory_mb,
+        tiles=bool(args.tiles and not args.queries), base_url=args.base_url
+    )
@@ -1,8 +1,7 @@
 import os
 import sys
-import subprocess
 import logging
-import time
+import argparse
 import pandas as pd
 
 # --- Configuración de Logging ---
@@ -12,6 +11,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
+from src.scrapers.browser_profile import DEFAULT_PROFILE, vendor_worker_args
+from src.scrapers.maps_worker import MapsWorkerPool, WorkerTimeout, append_places_to_csv
+from src.scrapers.query_journal import QueryJournal
+
 # --- Constantes y Rutas ---
 SCRAPER_VENDOR_DIR = os.path.join(PROJECT_ROOT, 'vendor', 'google-maps-scraper')
 VENV_PYTHON = os.path.join(SCRAPER_VENDOR_DIR, '.venv', 'bin', 'python')
@@ -20,37 +23,25 @@ SCRAPER_MAIN_SCRIPT = os.path.join(SCRAPER_VENDOR_DIR, 'main.py')
 INPUT_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'salud_publica', 'centros_salud_ssc.csv')
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'exports', 'google_maps_salud')
 RESULTS_FILE = os.path.join(OUTPUT_DIR, 'google_maps_salud_results.csv')
+RESULTADOS_POR_CONSULTA = 3  # Limitar a 3 resultados para obtener el más relevante
+TIMEOUT_CONSULTA_S = 120
+PAUSA_ENTRE_CONSULTAS_S = 3  # Pausa prudente de cada worker entre consultas
+JOURNAL_DB = os.path.join(OUTPUT_DIR, 'query_journal.db')  # Estado por consulta, usado por --resume
+MAX_INTENTOS_CONSULTA = 3
+
+def main(workers=1, resume=False):
+    """
+    Lee los centros de salud, genera consultas y ejecuta el scraper.
+    Con `resume` se retoma la ejecución anterior: se conservan los resultados
+    y se omiten las consultas que el journal marca como completadas.
+    """
+    logging.info("--- Iniciando scraping de Google Maps para Centros de Salud ---")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def run_scraper_for_query(query, output_file):
-    """Ejecuta el scraper de Google Maps para una consulta específica."""
     if not os.path.exists(VENV_PYTHON):
         logging.error(f"El entorno virtual del scraper no se encuentra en: {VENV_PYTHON}")
         return
 
-    command = [
-        VENV_PYTHON,
-        SCRAPER_MAIN_SCRIPT,
-        '-s', query,       # Argumento correcto para la búsqueda
-        '-t', '3',         # Limitar a 3 resultados para obtener el más relevante
-        '-o', output_file,
-        '--append'
-    ]
-    try:
-        process = subprocess.run(command, capture_output=True, text=True, cwd=SCRAPER_VENDOR_DIR, timeout=120)
-        if process.returncode == 0:
-            logging.info(f"Consulta '{query}' completada exitosamente.")
-        else:
-            logging.error(f"Error al ejecutar el scraper para la consulta '{query}'. Salida: {process.stderr.strip()}")
-    except subprocess.TimeoutExpired:
-        logging.error(f"Timeout al ejecutar el scraper para la consulta '{query}'.")
-    except Exception as e:
-        logging.error(f"Ocurrió un error inesperado para la consulta '{query}': {e}")
-
-def main():
-    """Lee los centros de salud, genera consultas y ejecuta el scraper."""
-    logging.info("--- Iniciando scraping de Google Maps para Centros de Salud ---")
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
     if not os.path.exists(INPUT_CSV_PATH):
         logging.error(f"El archivo de entrada no se encuentra: {INPUT_CSV_PATH}")
         return
@@ -68,22 +59,52 @@ def main():
 
     # Eliminar duplicados si los hubiera
     search_queries = sorted(list(set(search_queries)))
-    total_queries = len(search_queries)
-    logging.info(f"Se ejecutarán {total_queries} consultas de búsqueda.")
 
-    # Limpiar archivo de resultados si existe para empezar de cero
-    if os.path.exists(RESULTS_FILE):
+    journal = QueryJournal(JOURNAL_DB)
+    journal.start_sweep(search_queries, resume=resume)
+    if resume:
+        search_queries = journal.pending_queries(search_queries, MAX_INTENTOS_CONSULTA)
+        logging.info("Retomando la ejecución anterior a partir del journal de consultas.")
+    elif os.path.exists(RESULTS_FILE):
+        # Limpiar archivo de resultados si existe para empezar de cero
         os.remove(RESULTS_FILE)
         logging.info(f"Archivo de resultados anterior eliminado: {RESULTS_FILE}")
 
-    for i, query in enumerate(search_queries):
-        logging.info(f"--- Procesando consulta {i+1}/{total_queries}: {query} ---")
-        run_scraper_for_query(query, RESULTS_FILE)
-        time.sleep(3) # Pausa prudente entre consultas
+    total_queries = len(search_queries)
+    logging.info(f"Se ejecutarán {total_queries} consultas de búsqueda.")
 
+    # Las consultas se reparten entre `workers` navegadores; solo este hilo escribe
+    # en el archivo de resultados, por lo que no hay escrituras concurrentes.
+    logging.info(f"Ejecutando hasta {workers} consultas en paralelo.")
+    # Los navegadores usan el mismo perfil liviano que el barrido principal: sin
+    # ventana, sin imágenes, fuentes ni teselas, y con el contexto renovado cada
+    # cierta cantidad de consultas.
+    with MapsWorkerPool(workers, VENV_PYTHON, SCRAPER_MAIN_SCRIPT, SCRAPER_VENDOR_DIR,
+                        worker_args=vendor_worker_args(DEFAULT_PROFILE),
+                        pause_between_queries=PAUSA_ENTRE_CONSULTAS_S) as pool:
+        resultados = pool.run_queries(search_queries, RESULTADOS_POR_CONSULTA, timeout=TIMEOUT_CONSULTA_S)
+        for i, resultado in enumerate(resultados):
+            query = resultado.query
+            if resultado.error is None:
+                append_places_to_csv(resultado.places, RESULTS_FILE)
+                journal.mark_done(query, len(resultado.places), resultado.duration)
+                logging.info(f"Consulta {i+1}/{total_queries} '{query}' completada exitosamente ({len(resultado.places)} resultados).")
+            elif isinstance(resultado.error, WorkerTimeout):
+                journal.mark_failed(query, resultado.error, resultado.duration)
+                logging.error(f"Timeout al ejecutar el scraper para la consulta '{query}'.")
+            else:
+                journal.mark_failed(query, resultado.error, resultado.duration)
+                logging.error(f"Error al ejecutar el scraper para la consulta '{query}': {resultado.error}")
+
+    journal.close()
     logging.info("--- Scraping de Google Maps (Salud) finalizado ---")
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Scraper de Google Maps para centros de salud.")
+    parser.add_argument('--workers', type=int, default=1, help='Número de consultas a ejecutar en paralelo.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Retomar la ejecución anterior sin borrar resultados ni repetir consultas completadas.')
+    args = parser.parse_args()
+    main(workers=args.workers, resume=args.resume)
 
 
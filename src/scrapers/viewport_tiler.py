@@ -0,0 +1,161 @@
+import heapq
+import math
+from collections import namedtuple
+from itertools import count
+
+from src.scrapers.query_journal import DONE
+
+# Rectangular area of the map, in degrees.
+Tile = namedtuple('Tile', ['south', 'west', 'north', 'east'])
+
+# Visible map area (pixels) next to the results panel of a 1280x800 browser
+# window, used to pick the zoom at which a tile fills the map.
+MAP_VIEW_PX = (870, 720)
+METERS_PER_PX_AT_ZOOM_0 = 156543.03392
+MIN_ZOOM, MAX_ZOOM = 3, 21
+
+
+def tile_center(tile):
+    return (tile.south + tile.north) / 2, (tile.west + tile.east) / 2
+
+
+def tile_zoom(tile):
+    """Largest zoom at which the whole tile fits in the visible map."""
+    lat, _ = tile_center(tile)
+    height_m = (tile.north - tile.south) * 111320
+    width_m = (tile.east - tile.west) * 111320 * math.cos(math.radians(lat))
+    meters_per_px = max(height_m / MAP_VIEW_PX[1], width_m / MAP_VIEW_PX[0], 1e-9)
+    zoom = math.floor(math.log2(METERS_PER_PX_AT_ZOOM_0 * math.cos(math.radians(lat)) / meters_per_px))
+    return max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+
+
+def split_tile(tile):
+    """The four quadrants of a tile."""
+    lat, lng = tile_center(tile)
+    return [
+        Tile(lat, tile.west, tile.north, lng),
+        Tile(lat, lng, tile.north, tile.east),
+        Tile(tile.south, tile.west, lat, lng),
+        Tile(tile.south, lng, lat, tile.east),
+    ]
+
+
+def count_in_tile(tile, positions):
+    """
+    How many listing positions (lat, lng) fall inside `tile`. The feed of a
+    viewport search also lists nearby places outside it; listings whose
+    position is unknown (None) are counted as inside.
+    """
+    return sum(1 for position in positions
+               if position is None
+               or (tile.south <= position[0] <= tile.north and tile.west <= position[1] <= tile.east))
+
+
+class TileQuery(str):
+    """
+    A category search restricted to one map tile. Its string value, e.g.
+    '"ferretería" @-36.81500,-73.07500,13z', is the key used by the journal and
+    in logs; `search` and `viewport` are what the scraper worker is sent.
+    """
+
+    def __new__(cls, category, tile):
+        lat, lng = tile_center(tile)
+        zoom = tile_zoom(tile)
+        query = super().__new__(cls, f'"{category}" @{lat:.5f},{lng:.5f},{zoom}z')
+        query.category = category
+        query.tile = tile
+        query.search = category
+        query.viewport = (round(lat, 5), round(lng, 5), zoom)
+        return query
+
+
+class TilePlanner:
+    """
+    Plan of Google Maps searches that covers a bounding box with viewport
+    tiles instead of a list of named locations.
+
+    Each category starts with one tile for the whole `bbox`. A search whose
+    feed shows at least `saturation_count` listings inside its tile (see
+    `count_in_tile`) hit Google Maps' result cap, so `record()` splits its
+    tile into four quadrants and queues them,
+    down to `max_depth` splits; unsaturated tiles are not split. Larger tiles
+    run first.
+
+    Like QueryPlanner, it is an iterator that grows while it is consumed and
+    every result must be reported with `record()`. With `resume`, tiles the
+    journal `history` marks as done are not searched again but are split
+    from their recorded listing count, and tiles that failed `max_attempts`
+    times are skipped (but split if saturated). `on_queue`, if given, is
+    called with each tile query as it is queued.
+    """
+
+    def __init__(self, categories, bbox, saturation_count, max_depth=4, history=None,
+                 resume=False, max_attempts=3, on_queue=None):
+        self.categories = list(categories)
+        self.bbox = Tile(*bbox)
+        self.saturation_count = saturation_count
+        self.max_depth = max_depth
+        self.history = history or {}
+        self.resume = resume
+        self.max_attempts = max_attempts
+        self.on_queue = on_queue
+        self.stats = {'queued': 0, 'split': 0, 'resumed': 0}
+        self._heap = []
+        self._order = count()
+        self._offered = {}  # query -> (TileQuery, depth)
+        for category in self.categories:
+            self._offer(TileQuery(category, self.bbox), 0)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._heap:
+            raise StopIteration
+        return heapq.heappop(self._heap)[-1]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def offered(self):
+        """Every tile query of this sweep so far: queued, resumed or skipped."""
+        return list(self._offered)
+
+    def _offer(self, query, depth):
+        if query in self._offered:
+            return
+        self._offered[query] = (query, depth)
+        entry = self.history.get(query)
+
+        if self.resume and entry is not None:
+            if entry.status == DONE:
+                self.stats['resumed'] += 1
+                self.record(query, entry.found_count)
+                return
+            if entry.attempts >= self.max_attempts:
+                # Out of attempts, but a feed it saw saturated is still split
+                self.record(query, entry.found_count)
+                return
+
+        heapq.heappush(self._heap, (depth, next(self._order), query))
+        self.stats['queued'] += 1
+        if self.on_queue:
+            self.on_queue(query)
+
+    def record(self, query, found_count):
+        """
+        Reports how many listings a tile search's feed showed, even if
+        extracting its places then failed. A saturated
+        tile is split into quadrants; returns how many were queued.
+        """
+        if query not in self._offered or found_count is None or found_count < self.saturation_count:
+            return 0
+        query, depth = self._offered[query]
+        if depth >= self.max_depth:
+            return 0
+        queued = self.stats['queued']
+        for quadrant in split_tile(query.tile):
+            self._offer(TileQuery(query.category, quadrant), depth + 1)
+        if self.stats['queued'] > queued:
+            self.stats['split'] += 1
+        return self.stats['queued'] - queued
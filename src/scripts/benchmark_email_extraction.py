@@ -0,0 +1,72 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(PROJECT_ROOT)
+
+from src.scrapers.email_extractor import extract
+
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, 'data', 'fixtures', 'html')
+FIXTURE_URL = 'https://www.sitio.cl/'
+
+# Extracción anterior: regex sobre el HTML crudo más un árbol BeautifulSoup para los enlaces
+LEGACY_EMAIL_REGEX = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+LEGACY_CONTACT_KEYWORDS = ['contacto', 'contact', 'nosotros', 'quienes-somos', 'about', 'empresa']
+
+
+def legacy_extract(html, page_url):
+    from bs4 import BeautifulSoup
+    emails = {email.lower() for email in LEGACY_EMAIL_REGEX.findall(html)}
+    links = set()
+    soup = BeautifulSoup(html, 'html.parser')
+    for link in soup.find_all('a', href=True):
+        href = link['href'].lower()
+        link_text = link.get_text().lower()
+        if any(k in href for k in LEGACY_CONTACT_KEYWORDS) or any(k in link_text for k in LEGACY_CONTACT_KEYWORDS):
+            links.add(link['href'])
+    return emails, links
+
+
+def bench(function, html, repeat):
+    """Mejor tiempo por llamada, en milisegundos."""
+    times = timeit.repeat(lambda: function(html, FIXTURE_URL), number=1, repeat=repeat)
+    return min(times) * 1000
+
+
+def main(repeat=20):
+    """
+    Mide el tiempo de extracción de correos y enlaces de contacto por página
+    sobre los HTML guardados en data/fixtures/html, comparando el extractor de
+    una sola pasada con la extracción anterior (si BeautifulSoup está instalado).
+    """
+    try:
+        import bs4  # noqa: F401
+        with_legacy = True
+    except ImportError:
+        with_legacy = False
+        print("BeautifulSoup no está instalado: se mide solo el extractor nuevo.")
+
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    if not paths:
+        print(f"No se encontraron fixtures en {FIXTURES_DIR}")
+        return
+
+    print(f"{'fixture':<32}{'KB':>8}{'nuevo ms':>11}{'anterior ms':>13}  correos")
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        result = extract(html, FIXTURE_URL)
+        new_ms = bench(extract, html, repeat)
+        legacy_ms = f"{bench(legacy_extract, html, repeat):>13.2f}" if with_legacy else f"{'-':>13}"
+        print(f"{os.path.basename(path):<32}{len(html) / 1024:>8.1f}{new_ms:>11.2f}{legacy_ms}  {', '.join(sorted(result.emails)) or '-'}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmark de la extracción de correos sobre HTML guardados.")
+    parser.add_argument('--repeticiones', type=int, default=20, help='Repeticiones por fixture (se toma el mejor tiempo).')
+    args = parser.parse_args()
+    main(args.repeticiones)
@@ -37,6 +37,7 @@ def export_data_to_csv():
             e.nombre AS \"Nombre\",
             e.direccion AS \"Dirección\",
             e.categoria_google AS \"Categoría\",
+            e.ubicacion AS \"Ubicación\",
             GROUP_CONCAT(DISTINCT t.numero) AS \"Teléfonos\",
             GROUP_CONCAT(DISTINCT w.url) AS \"Sitios Web\",
             GROUP_CONCAT(DISTINCT em.email) AS \"Correos Electrónicos\",
@@ -50,7 +51,7 @@ def export_data_to_csv():
         LEFT JOIN
             emails em ON e.id = em.empresa_id
         GROUP BY
-            e.id, e.nombre, e.direccion, e.categoria_google, e.fuente
+            e.id, e.nombre, e.direccion, e.categoria_google, e.ubicacion, e.fuente
         ORDER BY
             e.nombre;
     """
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from src.processing.location_matcher import LocationMatcher, normalize_series, normalize_text
+
+LOCATIONS = ("Concepción", "Pedro de Valdivia", "Pedro de Valdivia Bajo", "Hualpén")
+ADDRESSES = [
+    "Av. Costanera 1200, Pedro de Valdivia Bajo, Concepción, Bío Bío",
+    "Colón 8000, Hualpén, Biobío",
+    "Barros Arana 500, Concepción, Región del Bio-Bio",
+    "Providencia 100, Santiago, Región Metropolitana",
+    "Ñuble 123, Chillán, Ñuble",
+    None,
+]
+
+
+@pytest.fixture(params=["python", "pyarrow"])
+def string_storage(request):
+    # Con pyarrow las columnas de texto usan el motor RE2, más estricto con los
+    # patrones que el módulo re de Python.
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    with pd.option_context("mode.string_storage", request.param):
+        yield request.param
+
+
+def test_normalize_series_matches_normalize_text(string_storage):
+    texts = pd.Series(["Concepción", "Ñuble", "BÍO BÍO", "Pingüino"])
+    assert normalize_series(texts).tolist() == [normalize_text(t) for t in texts]
+
+
+def test_match_series_agrees_with_match(string_storage):
+    matcher = LocationMatcher(LOCATIONS)
+    addresses = pd.Series(ADDRESSES, dtype=object)
+    expected = [matcher.match(address) for address in ADDRESSES]
+    matched = [None if pd.isna(value) else value for value in matcher.match_series(addresses)]
+    assert matched == expected
+    assert expected[:3] == ["Pedro de Valdivia Bajo", "Hualpén", "Concepción"]
@@ -0,0 +1,58 @@
+import glob
+import importlib.util
+import os
+
+import pytest
+
+SCRAPER_DIR = os.path.join(os.path.dirname(__file__), '..', 'vendor', 'google-maps-scraper')
+FIXTURES = sorted(glob.glob(os.path.join(SCRAPER_DIR, 'fixtures', 'search_tbm_map*.txt')))
+
+# (place_id, name, phone_number, website) of every place in each recorded response, in order
+EXPECTED = {
+    'search_tbm_map.txt': [
+        ('0x9669b5e3a1f2c0d1:0x1a2b3c4d5e6f7081', 'Ferretería El Roble', '41 222 3344',
+         'https://www.ferreteriaelroble.cl/'),
+        ('0x9669b5f0c2d3e4f5:0x2b3c4d5e6f708192', 'Clínica Dental Sonrisa', '+56 9 8765 4321',
+         'https://clinicasonrisa.cl/'),
+        ('0x9669b60112233445:0x3c4d5e6f708192a3', 'Constructora Biobío Ltda.', '', ''),
+    ],
+    'search_tbm_map_page2.txt': [
+        ('0x9669b5e3a1f2c0d1:0x1a2b3c4d5e6f7081', 'Ferretería El Roble', '41 222 3344',
+         'https://www.ferreteriaelroble.cl/'),
+        ('0x9669b6aa00000001:0x4d5e6f708192a3b4', 'Pinturas Tucapel', '41 233 4455', 'http://pinturastucapel.cl'),
+    ],
+}
+
+
+@pytest.fixture(scope='module')
+def scraper():
+    # The vendor scraper imports Playwright at module level
+    pytest.importorskip('playwright.sync_api')
+    spec = importlib.util.spec_from_file_location('google_maps_scraper', os.path.join(SCRAPER_DIR, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_fixture(scraper, path):
+    with open(path, encoding='utf-8') as f:
+        return scraper.parse_search_payload(f.read())
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=os.path.basename)
+def test_parse_search_payload(scraper, path):
+    places = read_fixture(scraper, path)
+    fields = [(place.place_id, place.name, place.phone_number, place.website) for place in places]
+    assert fields == EXPECTED[os.path.basename(path)]
+    assert all(place.introduction == scraper.NO_INTRODUCTION for place in places)
+
+
+def test_merged_place_keeps_one_introduction_sentinel(scraper):
+    incomplete = read_fixture(scraper, FIXTURES[0])[2]
+    dom_place = scraper.parse_place({'name': incomplete.name, 'address': 'Cochrane 635, Concepción'})
+    merged = scraper.merge_places(incomplete, dom_place)
+    assert merged.address == 'Cochrane 635, Concepción'
+    assert merged.introduction == dom_place.introduction == scraper.NO_INTRODUCTION
+
+    dom_place.introduction = 'Materiales de construcción'
+    assert scraper.merge_places(incomplete, dom_place).introduction == 'Materiales de construcción'
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+
+import pytest
+
+from src.config import SEARCH_BBOX
+from src.scrapers.viewport_tiler import Tile, TilePlanner, count_in_tile
+
+STANDIN_PATH = os.path.join(os.path.dirname(__file__), '..', 'vendor', 'google-maps-scraper', 'fixtures',
+                            'standin_maps.py')
+FEED_CAP = 120
+SATURATION = 108
+
+
+@pytest.fixture(scope='module')
+def standin():
+    spec = importlib.util.spec_from_file_location('standin_maps', STANDIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sweep(standin, places, in_tile):
+    """Runs a tile plan against the stand-in feed; returns the searches run and the places listed."""
+    planner = TilePlanner(['ferretería'], SEARCH_BBOX, SATURATION, max_depth=4)
+    searches, listed_ids = 0, set()
+    for query in planner:
+        searches += 1
+        listed, _ = standin.search_results(places, *query.viewport, FEED_CAP)
+        listed_ids.update(place['feature_id'] for place in listed)
+        positions = [(place['lat'], place['lng']) for place in listed]
+        planner.record(query, count_in_tile(query.tile, positions) if in_tile else len(listed))
+    return searches, listed_ids
+
+
+def test_count_in_tile_ignores_listings_outside():
+    tile = Tile(-37.0, -73.2, -36.8, -73.0)
+    positions = [(-36.9, -73.1), (-36.7, -73.1), (-36.9, -72.9), None]
+    assert count_in_tile(tile, positions) == 2
+
+
+def test_tile_plan_covers_standin_places(standin):
+    places = standin.generate_places(1500, seed=1)
+    bbox = Tile(*SEARCH_BBOX)
+    in_bbox = {place['feature_id'] for place in places
+               if bbox.south <= place['lat'] <= bbox.north and bbox.west <= place['lng'] <= bbox.east}
+
+    searches, listed_ids = sweep(standin, places, in_tile=True)
+    raw_searches, _ = sweep(standin, places, in_tile=False)
+
+    assert in_bbox <= listed_ids
+    # Counting the places around each tile makes every tile look saturated
+    assert searches < raw_searches